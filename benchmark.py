@@ -0,0 +1,333 @@
+import argparse
+import glob
+import sys
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import compare_to_word_lists
+
+# Benchmarks the correction on a synthetic corpus, generated from the word lists with OCR-like
+# noise. Each stage is timed in a new process, so that the peak memory (RSS) is measured for
+# that stage only. The report is written as JSON, and can be compared with a report from
+# another commit.
+#
+# Usage: python benchmark.py --folders 10 --files 3 --words 2000 --output report.json
+#        python benchmark.py --output new.json --compare old.json
+
+stage_names = ["compare_folder", "search_not_found", "get_new_word", "is_known", "replace_spaced_words", "normalization", "startup"]
+
+one_letter_words = ["m", "g", "a", "i", "å", "ä", "ö"]
+
+# Replacements are made by replacing the second with the first in the replacers, e.g. the OCR
+# error "c" for "e", and these are added for digits
+digit_replacers = [("1", "l"), ("1", "I"), ("0", "o"), ("0", "O"), ("5", "S"), ("8", "B")]
+
+#######################
+# Generation of the synthetic corpus
+#######################
+
+def get_word_list_words(terminologies_file_name):
+    words = []
+    with open(terminologies_file_name) as terminology_file:
+        for file_name in terminology_file.readlines():
+            words.extend([word for word in compare_to_word_lists.get_words(file_name.strip(), []) if word != ""])
+    return sorted(set(words))
+
+# An OCR error, made by applying the replacers in reverse
+def add_replacer_noise(word, replacers, random_generator):
+    possible = [(wrong, right) for (wrong, right) in replacers if right in word]
+    if len(possible) == 0:
+        return word
+    wrong, right = random_generator.choice(possible)
+    positions = [i for i in range(len(word)) if word.startswith(right, i)]
+    position = random_generator.choice(positions)
+    return word[:position] + wrong + word[position + len(right):]
+
+def add_noise(word, replacers, random_generator):
+    r = random_generator.random()
+    if r < 0.08:
+        return add_replacer_noise(word, replacers, random_generator)
+    if r < 0.11: # spaced letters
+        return " ".join(word)
+    if r < 0.13 and len(word) > 4: # hyphen from a line break, that is left in the word
+        split_at = random_generator.randint(2, len(word) - 2)
+        return word[:split_at] + random_generator.choice(["-", "- ", " -"]) + word[split_at:]
+    if r < 0.14:
+        return add_replacer_noise(word, digit_replacers, random_generator)
+    if r < 0.15:
+        return str(random_generator.randint(1, 1999))
+    if r < 0.18:
+        return word + random_generator.choice([".", ",", ":", ";", "!", "?"])
+    return word
+
+def generate_corpus(terminologies_file_name, corpus_folder, nr_of_folders, nr_of_files_per_folder, nr_of_words_per_file, replacers, seed):
+    random_generator = random.Random(seed)
+    words = get_word_list_words(terminologies_file_name)
+    for folder_nr in range(nr_of_folders):
+        folder = os.path.join(corpus_folder, str(1800 + folder_nr))
+        os.makedirs(folder, exist_ok=True)
+        for file_nr in range(nr_of_files_per_folder):
+            lines = []
+            nr_of_words = 0
+            while nr_of_words < nr_of_words_per_file:
+                nr_of_words_in_line = min(random_generator.randint(5, 25), nr_of_words_per_file - nr_of_words)
+                lines.append(" ".join([add_noise(random_generator.choice(words), replacers, random_generator) for i in range(nr_of_words_in_line)]))
+                nr_of_words = nr_of_words + nr_of_words_in_line
+            with open(os.path.join(folder, "issue" + str(file_nr) + ".txt"), "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+
+#######################
+# The stages, which each return (seconds, nr of tokens processed), and optionally a dictionary
+# with more results for the report
+#######################
+
+def get_corpus_files(corpus_folder):
+    return sorted(glob.glob(os.path.join(corpus_folder, "*", "*.txt")))
+
+def read_corpus_texts(corpus_folder):
+    texts = []
+    for file_name in get_corpus_files(corpus_folder):
+        with open(file_name, encoding="utf-8-sig") as f:
+            texts.append(f.read())
+    return texts
+
+# The known words, spell checker and frequencies, as when running compare_folder (but with the
+# frequencies for the whole corpus)
+def get_correction_setup(config):
+    known_words = compare_to_word_lists.get_known_words(config["terminologies"], [])
+    spellchecker = compare_to_word_lists.get_spellchecker(config["language"], config["distance"], known_words)
+    raw_freq_dict = {}
+    for folder in sorted(glob.glob(os.path.join(config["corpus_folder"], "*"))):
+        compare_to_word_lists.add_to_frequency_dictionary(raw_freq_dict, compare_to_word_lists.get_raw_frequency(folder))
+    return known_words, spellchecker, raw_freq_dict
+
+# All tokens in the corpus, with the next token
+def get_corpus_tokens(texts):
+    tokens_with_next = []
+    for text in texts:
+        for line in compare_to_word_lists.get_lines(text):
+            tokens = compare_to_word_lists.tokenize_words(line)
+            for nr, token in enumerate(tokens):
+                tokens_with_next.append((token, tokens[nr + 1] if nr < len(tokens) - 1 else ""))
+    return tokens_with_next
+
+def count_corpus_tokens(config):
+    return len(get_corpus_tokens(read_corpus_texts(config["corpus_folder"])))
+
+def run_compare_folder(config):
+    nr_of_tokens = count_corpus_tokens(config)
+    output_folder = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        start = time.perf_counter()
+        compare_to_word_lists.compare_folder(corpus_folder=config["corpus_folder"], terminologies_file_name=config["terminologies"], output_filename="benchmark-statistics.txt", main_output=os.path.join(output_folder, "statistics"), main_output_text=os.path.join(output_folder, "text"), periodical="benchmark", language=config["language"], distance=config["distance"], workers=config["workers"], tokenizer=config["tokenizer"])
+        seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_folder)
+    return seconds, nr_of_tokens
+
+def run_search_not_found(config):
+    known_words, spellchecker, raw_freq_dict = get_correction_setup(config)
+    texts = read_corpus_texts(config["corpus_folder"])
+    nr_of_tokens = len(get_corpus_tokens(texts))
+    start = time.perf_counter()
+    for text in texts:
+        compare_to_word_lists.search_not_found(text, known_words, {}, {}, {}, {}, spellchecker, raw_freq_dict, config["distance"], compare_to_word_lists.default_replacers, config["one_letter_words"], compare_to_word_lists.is_known_compound, 2, [])
+    return time.perf_counter() - start, nr_of_tokens
+
+# get_new_word is timed for the unique unknown words
+def run_get_new_word(config):
+    known_words, spellchecker, raw_freq_dict = get_correction_setup(config)
+    unknown = {}
+    for token, next_word in get_corpus_tokens(read_corpus_texts(config["corpus_folder"])):
+        if (token, next_word) not in unknown and not compare_to_word_lists.is_known(token, next_word, known_words, spellchecker, config["one_letter_words"], compare_to_word_lists.is_known_compound):
+            unknown[(token, next_word)] = True
+    start = time.perf_counter()
+    for token, next_word in unknown:
+        compare_to_word_lists.get_new_word(token, next_word, known_words, spellchecker, raw_freq_dict, config["distance"], compare_to_word_lists.default_replacers, config["one_letter_words"], compare_to_word_lists.is_known_compound, 2)
+    return time.perf_counter() - start, len(unknown)
+
+def run_is_known(config):
+    known_words, spellchecker, raw_freq_dict = get_correction_setup(config)
+    tokens_with_next = get_corpus_tokens(read_corpus_texts(config["corpus_folder"]))
+    start = time.perf_counter()
+    for token, next_word in tokens_with_next:
+        compare_to_word_lists.is_known(token, next_word, known_words, spellchecker, config["one_letter_words"], compare_to_word_lists.is_known_compound)
+    return time.perf_counter() - start, len(tokens_with_next)
+
+# replace_spaced_words is timed for each line, and the tokens are the words separated by spaces
+def run_replace_spaced_words(config):
+    known_words, spellchecker, raw_freq_dict = get_correction_setup(config)
+    lines = []
+    for text in read_corpus_texts(config["corpus_folder"]):
+        lines.extend(compare_to_word_lists.get_lines(text.replace("  ", " ")))
+    start = time.perf_counter()
+    for line in lines:
+        compare_to_word_lists.replace_spaced_words(line, known_words, spellchecker, compare_to_word_lists.default_replacers, {}, config["one_letter_words"])
+    return time.perf_counter() - start, sum([len(line.split(" ")) for line in lines])
+
+# The normalization of each token in is_known and clean_word, with the translate tables and
+# frozensets in compare_to_word_lists, compared with the chained replace calls and lists they replaced
+def chained_normalize(word):
+    cleaned = word.replace("z. B.", "").replace("u. a.", "").replace(".", "").replace(",", "").replace("!", "").replace("?", "").replace(":", "").replace("(", "").replace(")", "").replace(";", "").replace("„", "").replace('"', "").replace(":", "").replace("'", "").replace('“', "").replace('‘', "").replace('»', "").replace('«', "").replace('}', "").replace('{', "").replace('*', "").replace("”", "").replace("[", "").replace("]", "").replace("•","").replace("’","").replace("=","").replace(" ", "")
+    only_dividers = False
+    for nr in [1, 2, 3, 4]:
+        if word in [el*nr for el in compare_to_word_lists.dividers]:
+            only_dividers = True
+    without_digits = ''.join([i for i in word if not i.isdigit()])
+    only_hyphens_and_dots = word.replace("-", "").replace("=", "").replace("_", "").replace("•", "").replace("—", "").replace(".", "").strip() == ""
+    is_number = word.replace("-", "").replace("—", "").replace(".", "").replace(",", "").replace("°", "").replace(":", "").replace("Nr.", "").replace("g", "").replace("/", "").replace("'", "").isdigit()
+    return cleaned, only_dividers, without_digits, only_hyphens_and_dots, is_number
+
+def normalize(word):
+    cleaned = compare_to_word_lists.clean_word(word)
+    only_dividers = word in compare_to_word_lists.repeated_dividers
+    without_digits = word.translate(compare_to_word_lists.digit_deletion_table)
+    only_hyphens_and_dots = word.translate(compare_to_word_lists.only_hyphens_and_dots_table).strip() == ""
+    is_number = word.translate(compare_to_word_lists.number_table).isdigit()
+    return cleaned, only_dividers, without_digits, only_hyphens_and_dots, is_number
+
+def run_normalization(config):
+    tokens = [token for (token, next_word) in get_corpus_tokens(read_corpus_texts(config["corpus_folder"]))]
+    start = time.perf_counter()
+    chained = [chained_normalize(token) for token in tokens]
+    chained_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    normalized = [normalize(token) for token in tokens]
+    seconds = time.perf_counter() - start
+    if normalized != chained:
+        print("The normalization differs from the chained replace calls")
+    return seconds, len(tokens), {"chained_seconds": chained_seconds, "saved_ns_per_token": (chained_seconds - seconds)/len(tokens)*1e9 if tokens else 0}
+
+# A short job (correcting one file, without plots) in a new Python process, so that the time
+# includes starting Python and importing the libraries, as for each spawned worker process.
+# Importing compare_to_word_lists alone is timed as well
+def time_new_process(arguments):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + arguments, check=True, stdout=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return time.perf_counter() - start
+
+def run_startup(config):
+    file_name = get_corpus_files(config["corpus_folder"])[0]
+    import_seconds = min([time_new_process(["-c", "import compare_to_word_lists"]) for i in range(3)])
+    seconds = time_new_process([os.path.abspath(__file__), "--short-job", file_name, "--terminologies", config["terminologies"], "--language", config["language"], "--distance", str(config["distance"]), "--tokenizer", config["tokenizer"]])
+    nr_of_tokens = 0
+    with open(file_name, encoding="utf-8-sig") as f:
+        nr_of_tokens = len(get_corpus_tokens([f.read()]))
+    return seconds, nr_of_tokens, {"import_seconds": import_seconds}
+
+def run_short_job(file_name, config):
+    compare_to_word_lists.set_tokenizer(config["tokenizer"])
+    known_words = compare_to_word_lists.get_known_words(config["terminologies"], [])
+    spellchecker = compare_to_word_lists.get_spellchecker(config["language"], config["distance"], known_words)
+    with open(file_name, encoding="utf-8-sig") as f:
+        text = f.read()
+    raw_freq_dict = compare_to_word_lists.get_raw_frequency(os.path.dirname(file_name))
+    compare_to_word_lists.search_not_found(text, known_words, {}, {}, {}, {}, spellchecker, raw_freq_dict, config["distance"], compare_to_word_lists.default_replacers, config["one_letter_words"], compare_to_word_lists.is_known_compound, 2, [])
+
+stages = {"compare_folder": run_compare_folder, "search_not_found": run_search_not_found, "get_new_word": run_get_new_word, "is_known": run_is_known, "replace_spaced_words": run_replace_spaced_words, "normalization": run_normalization, "startup": run_startup}
+
+# Run in a new process. ru_maxrss is in kilobytes on Linux (and bytes on macOS)
+def run_stage(stage_name, config, result_queue):
+    compare_to_word_lists.set_tokenizer(config["tokenizer"])
+    stage_result = stages[stage_name](config)
+    peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    result_queue.put((stage_result[0], stage_result[1], peak_rss, stage_result[2] if len(stage_result) > 2 else {}))
+
+def run_stage_in_new_process(stage_name, config):
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(target=run_stage, args=(stage_name, config, result_queue))
+    process.start()
+    seconds, nr_of_tokens, peak_rss, more_results = result_queue.get()
+    process.join()
+    result = {"seconds": seconds, "nr_of_tokens": nr_of_tokens, "tokens_per_second": nr_of_tokens/seconds if seconds > 0 else None, "peak_rss_kb": peak_rss}
+    result.update(more_results)
+    return result
+
+#######################
+# Report
+#######################
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+def print_report(report, previous_report=None):
+    print("\nCommit: " + report["commit"])
+    if previous_report:
+        print("Compared with: " + previous_report["commit"])
+    for stage_name, result in report["stages"].items():
+        line = stage_name.ljust(22) + ("%.0f tokens/s" % result["tokens_per_second"]).rjust(18) + ("%.0f MB" % (result["peak_rss_kb"]/1024)).rjust(10)
+        if previous_report and stage_name in previous_report["stages"]:
+            previous = previous_report["stages"][stage_name]
+            line = line + ("  %.2fx speed" % (result["tokens_per_second"]/previous["tokens_per_second"])).rjust(14) + ("  %.2fx memory" % (result["peak_rss_kb"]/previous["peak_rss_kb"])).rjust(15)
+        if "saved_ns_per_token" in result:
+            line = line + ("  %.0f ns saved per token (%.0f tokens/s with chained replace calls)" % (result["saved_ns_per_token"], result["nr_of_tokens"]/result["chained_seconds"]))
+        if "import_seconds" in result:
+            line = line + ("  %.2f s in total, %.2f s to import" % (result["seconds"], result["import_seconds"]))
+        print(line)
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the OCR correction on a synthetic corpus")
+    parser.add_argument("--terminologies", default="demo-word-lists.txt", help="the word lists to generate the corpus from, and to correct with")
+    parser.add_argument("--corpus-folder", default=None, help="where to generate the corpus (default: a temporary folder). An existing corpus is reused")
+    parser.add_argument("--folders", type=int, default=10)
+    parser.add_argument("--files", type=int, default=3, help="files per folder")
+    parser.add_argument("--words", type=int, default=2000, help="words per file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--language", default="sv")
+    parser.add_argument("--distance", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="workers for compare_folder")
+    parser.add_argument("--tokenizer", default="nltk", help="nltk or builtin")
+    parser.add_argument("--stages", default=",".join(stage_names), help="comma separated, from: " + ", ".join(stage_names))
+    parser.add_argument("--output", default=os.path.join(tempfile.gettempdir(), "benchmark-report.json"), help="the JSON report (by default in the temporary folder)")
+    parser.add_argument("--compare", default=None, help="a report from an earlier run to compare with")
+    parser.add_argument("--short-job", default=None, help=argparse.SUPPRESS) # the file to correct, for the startup stage
+    args = parser.parse_args()
+
+    if args.short_job:
+        run_short_job(args.short_job, {"terminologies": args.terminologies, "language": args.language, "distance": args.distance, "tokenizer": args.tokenizer, "one_letter_words": one_letter_words})
+        return
+
+    corpus_folder = args.corpus_folder
+    remove_corpus = False
+    if corpus_folder is None:
+        corpus_folder = tempfile.mkdtemp(prefix="benchmark_corpus_")
+        remove_corpus = True
+    if len(get_corpus_files(corpus_folder)) == 0:
+        print("Generating corpus in " + corpus_folder)
+        generate_corpus(args.terminologies, corpus_folder, args.folders, args.files, args.words, compare_to_word_lists.default_replacers, args.seed)
+
+    config = {"terminologies": args.terminologies, "corpus_folder": corpus_folder, "language": args.language, "distance": args.distance, "workers": args.workers, "tokenizer": args.tokenizer, "one_letter_words": one_letter_words}
+    report = {"commit": get_commit(), "config": {"folders": args.folders, "files": args.files, "words": args.words, "seed": args.seed, "language": args.language, "distance": args.distance, "workers": args.workers, "tokenizer": args.tokenizer}, "stages": {}}
+    try:
+        for stage_name in args.stages.split(","):
+            if stage_name not in stages:
+                print("Unknown stage " + stage_name + ", choose from: " + ", ".join(stage_names))
+                exit()
+            print("Running " + stage_name)
+            report["stages"][stage_name] = run_stage_in_new_process(stage_name, config)
+    finally:
+        if remove_corpus:
+            shutil.rmtree(corpus_folder)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print("Report written to " + args.output)
+
+    previous_report = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous_report = json.load(f)
+    print_report(report, previous_report)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,53 @@
+import glob
+import os
+import sys
+import time
+import compare_to_word_lists
+from nltk.tokenize import word_tokenize
+
+# Checks that the built-in tokenizer (tokenizer="builtin" in compare_folder) gives the same
+# tokens as NLTK's word_tokenize for each line in a corpus (the .txt files in the subfolders of
+# the corpus folder), and compares their speed. Without the NLTK punkt data, the built-in
+# tokenizer is compared with word_tokenize(line, preserve_line=True).
+#
+# The tests in tests/test_tokenizer.py do the same for a fixed sample. This is an optional check
+# for a whole corpus.
+#
+# Usage: python check_tokenizer.py nonsense-texts
+
+def run():
+    if len(sys.argv) != 2:
+        print("Usage: python check_tokenizer.py <corpus folder>")
+        exit()
+    lines = []
+    for file_name in sorted(glob.glob(os.path.join(sys.argv[1], "*", "*.txt"))):
+        lines.extend(compare_to_word_lists.read_lines(file_name))
+    print("Nr of lines: " + str(len(lines)))
+    
+    preserve_line = not compare_to_word_lists.is_punkt_available()
+    start = time.perf_counter()
+    nltk_tokens = [word_tokenize(line, preserve_line=preserve_line) for line in lines]
+    nltk_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    builtin_tokens = [compare_to_word_lists.builtin_word_tokenize(line) for line in lines]
+    builtin_seconds = time.perf_counter() - start
+    
+    nr_of_differences = 0
+    for line, nltk_line_tokens, builtin_line_tokens in zip(lines, nltk_tokens, builtin_tokens):
+        if nltk_line_tokens != builtin_line_tokens:
+            nr_of_differences = nr_of_differences + 1
+            if nr_of_differences <= 10:
+                print("\nDifferent tokens for: " + line)
+                print("NLTK:     " + str(nltk_line_tokens))
+                print("Built-in: " + str(builtin_line_tokens))
+    
+    nr_of_tokens = sum([len(tokens) for tokens in nltk_tokens])
+    print("\nNLTK:     %.0f tokens/s" % (nr_of_tokens/nltk_seconds if nltk_seconds > 0 else 0))
+    print("Built-in: %.0f tokens/s" % (nr_of_tokens/builtin_seconds if builtin_seconds > 0 else 0))
+    if nr_of_differences > 0:
+        print(str(nr_of_differences) + " of " + str(len(lines)) + " lines are tokenized differently")
+        sys.exit(1)
+    print("All lines are tokenized in the same way")
+
+run()
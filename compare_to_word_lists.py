@@ -1,18 +1,98 @@
+import array
+import bisect
 import glob
+import hashlib
+import heapq
+import importlib
+import itertools
+import json
+import mmap
 import os
 import re
-import copy
 import string
+import struct
+import sys
 import math
-import matplotlib.pyplot as plt
-from spellchecker import SpellChecker
-from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk.tokenize.treebank import TreebankWordDetokenizer
-from nltk.metrics import edit_distance
+import multiprocessing
+import multiprocessing.util
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# matplotlib, pyspellchecker and NLTK take seconds to import, so they are imported when first
+# used, with import_lazily, and not when the module (or a worker process) is started. So are the
+# modules only needed by the correction server and the SQLite files.
+plt = None
+SpellChecker = None
+sent_tokenize = None
+word_tokenize = None
+TreebankWordDetokenizer = None
+NLTKWordTokenizer = None
+edit_distance = None
+np = None
+gzip = None
+pkgutil = None
+sqlite3 = None
+http_server = None
+socket = None
+socketserver = None
+
+lazy_imports = {"gzip": ("gzip", None), "pkgutil": ("pkgutil", None), "sqlite3": ("sqlite3", None), "http_server": ("http.server", None), "socket": ("socket", None), "socketserver": ("socketserver", None), "plt": ("matplotlib.pyplot", None), "np": ("numpy", None), "SpellChecker": ("spellchecker", "SpellChecker"), "sent_tokenize": ("nltk.tokenize", "sent_tokenize"), "word_tokenize": ("nltk.tokenize", "word_tokenize"), "TreebankWordDetokenizer": ("nltk.tokenize.treebank", "TreebankWordDetokenizer"), "NLTKWordTokenizer": ("nltk.tokenize.destructive", "NLTKWordTokenizer"), "edit_distance": ("nltk.metrics", "edit_distance")}
+
+def import_lazily(name):
+    imported = globals()[name]
+    if imported is None:
+        module_name, attribute = lazy_imports[name]
+        imported = importlib.import_module(module_name)
+        if attribute is not None:
+            imported = getattr(imported, attribute)
+        globals()[name] = imported
+    return imported
 
 
 dividers = [".", ",", "!", "?", ":", "(", ")", ";", "„", '"', ":", ":","'", "‘", "»", "«", "}", "{", "*", '”', "[", "]", "•", "=",'”', "—•", "^", "'", "/", "'", "“", "„"]
    
+##############
+# Normalization
+# The characters that are removed from, or compared with, the words in the hot paths (clean_word,
+# is_known, get_new_word and correct_lines) are compiled once into str.translate tables and
+# frozensets, instead of with chained replace calls and lists that are built for each word
+##############
+
+# The dividers without duplicates, in the same order
+unique_dividers = list(dict.fromkeys(dividers))
+divider_set = frozenset(dividers)
+dividers_and_hyphen = unique_dividers + ["-"]
+
+# Words with only one divider, repeated up to four times
+repeated_dividers = frozenset([divider*nr for nr in [1, 2, 3, 4] for divider in dividers])
+
+# Single character tokens that are not printed as likely errors in correct_lines
+not_error_characters = frozenset(["&", "—", "%", "-", "’"])
+
+# Tables for str.translate that remove characters
+clean_word_table = str.maketrans("", "", ".,!?:();„\"'“‘»«}{*”[]•’= ")
+hyphen_and_one_table = str.maketrans("", "", "-1")
+underscore_and_hyphen_table = str.maketrans("", "", "_-")
+hyphen_and_dot_table = str.maketrans("", "", "-.")
+only_hyphens_and_dots_table = str.maketrans("", "", "-=_•—.")
+number_table = str.maketrans("", "", "-—.,°:g/'")
+
+# Removes the characters for which isdigit() is True. The table is filled in for each character
+# the first time it is translated, so that all Unicode characters don't have to be checked
+class DigitDeletionTable(dict):
+    def __missing__(self, code_point):
+        translated = None if chr(code_point).isdigit() else code_point
+        self[code_point] = translated
+        return translated
+
+digit_deletion_table = DigitDeletionTable()
+
+hyphen_re = re.compile("-")
+
 letters = list(string.ascii_lowercase) + list(string.ascii_uppercase) + ["ü", "Ü", "å", "Å", "ä", "Ä", "ö", "Ö", "é", "É"]
 
 
@@ -77,6 +157,70 @@ def is_known_compound(word, next_word, known_words, spellchecker, one_letter_wor
             return True
     return False
     
+############################
+# Indexed version of the Swedish compound splitter above, which gives the same result.
+# All its rules need a known second part, so the known words are kept reversed in a sorted list, and
+# the longest end that a word shares with any known word is found with one binary search. Only
+# the split points within that end are then looked up, instead of all split points.
+############################
+
+class CompoundIndex:
+    def __init__(self, known_words):
+        self.known_words = known_words
+        self.sorted_reversed_words = sorted([word[::-1] for word in known_words])
+
+    # All i >= min_start for which word[i:] is a known word
+    def get_known_suffix_starts(self, word, min_start):
+        shared = get_longest_shared_start(self.sorted_reversed_words, word[::-1])
+        return [i for i in range(max(len(word) - shared, min_start), len(word)) if word[i:] in self.known_words]
+
+# The length of the longest start that word shares with any word in sorted_words. The word that
+# shares the longest start is next to where word would be inserted in the sorted list.
+def get_longest_shared_start(sorted_words, word):
+    pos = bisect.bisect_left(sorted_words, word)
+    longest = 0
+    for neighbour in sorted_words[max(pos - 1, 0):pos + 1]:
+        shared = 0
+        for a, b in zip(word, neighbour):
+            if a != b:
+                break
+            shared = shared + 1
+        if shared > longest:
+            longest = shared
+    return longest
+
+# The index for the latest known_words that was used, to build it only once per run
+compound_index = {"known_words": None, "index": None}
+
+def get_compound_index(known_words):
+    if compound_index["known_words"] is not known_words:
+        compound_index["index"] = CompoundIndex(known_words)
+        compound_index["known_words"] = known_words
+    return compound_index["index"]
+
+def is_known_compound_swedish_indexed(word, next_word, known_words, spellchecker, one_letter_words):
+    if len(word) < 7: # approx too short for not generating false negatives with compound split
+        return False
+    known_suffix_starts = get_compound_index(known_words).get_known_suffix_starts(word, 4)
+    # (The check that a three-letter part is combined with a long enough part is not needed here,
+    # as both parts are always at least 5 letters long with these split points)
+    for i in known_suffix_starts:
+        if 5 <= i < len(word) - 4:
+            first = word[:i]
+            if first in known_words or first + 'a' in known_words or first + 'e' in known_words:
+                return True
+            if first[-1] in ['o', 'e'] and first[:-1] + 'a' in known_words: #kyrko
+                return True
+            if "ium" in first and first.replace("ium", "ie") in known_words: #sanatorium
+                return True
+        # nattåg, where the known second part starts with the last letter of the first part
+        if 5 <= i + 1 < len(word) - 4 and word[i] == word[i - 1] and word[:i + 1] in known_words:
+            return True
+        if 5 <= i - 1 < len(word) - 4 and word[i - 1] in ['s', '-', 'e'] and word[:i - 1] in known_words: #binde
+            return True
+    return False
+
+
 ############################
 # For suggesting new words
 ############################
@@ -96,6 +240,119 @@ def is_suggestion_frequent_enough(raw_freq, raw_freq_dict, suggested_word):
 
 
 
+##############
+# SymSpell-style candidate generation, which can be used instead of the SpellChecker.
+# All variants with up to distance letters deleted from the beginning (prefix_length letters)
+# of the known words are indexed once. The candidates for a word are then the known words that
+# share a deleted variant with it, and that are within the distance of the word. Candidates are
+# returned as by SpellChecker.candidates, i.e. the known words at the smallest distance found.
+##############
+
+def get_deletes(word, distance):
+    deletes = {word}
+    current = {word}
+    for _ in range(distance):
+        current = {w[:i] + w[i + 1:] for w in current for i in range(len(w))}
+        deletes.update(current)
+    return deletes
+
+# Damerau-Levenshtein distance (with transpositions of adjacent letters), which is the number of
+# edits that SpellChecker.candidates applies to get from one word to the other
+def damerau_levenshtein_distance(a, b):
+    # A common beginning and end doesn't change the distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start = start + 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end = end + 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    if len(a) == 0 or len(b) == 0:
+        return len(a) + len(b)
+        
+    max_dist = len(a) + len(b)
+    last_row_for_letter = {}
+    d = [[max_dist] * (len(b) + 2)]
+    d.append([max_dist] + list(range(len(b) + 1)))
+    for i in range(1, len(a) + 1):
+        d.append([max_dist, i] + [0] * len(b))
+        last_col_for_match = 0
+        for j in range(1, len(b) + 1):
+            i1 = last_row_for_letter.get(b[j - 1], 0)
+            j1 = last_col_for_match
+            if a[i - 1] == b[j - 1]:
+                cost = 0
+                last_col_for_match = j
+            else:
+                cost = 1
+            d[i + 1][j + 1] = min(d[i][j] + cost, d[i + 1][j] + 1, d[i][j + 1] + 1, d[i1][j1] + (i - i1 - 1) + 1 + (j - j1 - 1))
+        last_row_for_letter[a[i - 1]] = i
+    return d[len(a) + 1][len(b) + 1]
+
+class SymSpellChecker:
+    def __init__(self, words, distance, prefix_length=7):
+        self.distance = distance
+        self.prefix_length = prefix_length
+        self.words = set()
+        self.deletes = {}
+        self.longest_word_length = 0
+        # All words are indexed, and the checks in should_check are made in candidates, when the
+        # length of the longest word is known
+        for word in words:
+            word = word.lower()
+            if word in self.words:
+                continue
+            self.words.add(word)
+            self.longest_word_length = max(self.longest_word_length, len(word))
+            for delete in get_deletes(word[:prefix_length], distance):
+                if delete in self.deletes:
+                    self.deletes[delete].append(word)
+                else:
+                    self.deletes[delete] = [word]
+
+    # Same as in SpellChecker: punctuation, numbers and too long words are not checked, and are
+    # not given as candidates either
+    def should_check(self, word):
+        if len(word) == 1 and word in string.punctuation:
+            return False
+        if len(word) > self.longest_word_length + 3:
+            return False
+        if word == "nan":
+            return True
+        try:
+            float(word)
+            return False
+        except ValueError:
+            return True
+
+    def candidates(self, word):
+        lower_word = word.lower()
+        if (lower_word in self.words and self.should_check(lower_word)) or not self.should_check(word):
+            return {word}
+            
+        candidates_at_distance = {}
+        checked = set()
+        for delete in get_deletes(lower_word[:self.prefix_length], self.distance):
+            for candidate in self.deletes.get(delete, []):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if abs(len(candidate) - len(lower_word)) > self.distance or not self.should_check(candidate):
+                    continue
+                dist = damerau_levenshtein_distance(candidate, lower_word)
+                if dist <= self.distance:
+                    if dist not in candidates_at_distance:
+                        candidates_at_distance[dist] = set()
+                    candidates_at_distance[dist].add(candidate)
+        for dist in range(1, self.distance + 1):
+            if dist in candidates_at_distance:
+                return candidates_at_distance[dist]
+        return None
+
+def get_spellchecker_candidates(spellchecker, word):
+    return spellchecker.candidates(word)
+
 def get_all_candidates_from_spellchecker(word, next_word, known_words, spellchecker, raw_freq_dict, distance, raw_freq, one_letter_words, is_known_compound_function):
     
     all_canditates_from_spellchecker = []
@@ -110,17 +367,20 @@ def get_all_candidates_from_spellchecker(word, next_word, known_words, spellchec
         okej_without_upper = True
         
     # Spell checker doesn't seem to handle hyphen and dot well, and long words are very slow
+    # (but not with the SymSpellChecker)
     # distance = 0 means no spell checker
     if distance > 0:
-        if "-" not in word and "_" not in word and "." not in word and len(word) < 15:
-            candidates = spellchecker.candidates(word)
+        if "-" not in word and "_" not in word and "." not in word and (len(word) < 15 or isinstance(spellchecker, SymSpellChecker)):
+            if lookup_recorder is not None:
+                lookup_recorder.spellchecked.add(word)
+            candidates = get_spellchecker_candidates(spellchecker, word)
            
             if candidates:
                 if distance == 1:
                     candidates = sorted(candidates) # order doesn't matter here, so to get same output each run
                 for candidate in candidates:
                     if is_known(candidate, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
-                        dist = edit_distance(candidate, word)
+                        dist = import_lazily("edit_distance")(candidate, word)
                         if dist <= distance:
                             if okej_without_upper or candidate[0].isupper():
                                 all_canditates_from_spellchecker.append(candidate)
@@ -149,10 +409,74 @@ def expand_with_one_letter(word, known_words, spellchecker, raw_freq_dict, raw_f
                 return expand_suggestion
     return None
     
+#######################
+# Index for expanding words with one letter
+# Each known word is indexed without its first and without its last character, so that the
+# expansions of a word with one letter that are known words are found with a dictionary lookup,
+# instead of with an is_known call for each letter. Expansions that are not known words are
+# checked with the compound function, as in is_known. Words with digits or "/" can be known by
+# other rules in is_known, so they are expanded with is_known as before.
+#######################
+
+class ExpansionIndex:
+    def __init__(self, known_words):
+        self.first_letters = {} # the known word without its first character -> the first characters
+        self.last_letters = {} # the known word without its last character -> the last characters
+        for word in known_words:
+            if len(word) > 1:
+                self.first_letters[word[1:]] = self.first_letters.get(word[1:], "") + word[0]
+                self.last_letters[word[:-1]] = self.last_letters.get(word[:-1], "") + word[-1]
+
+# The index for the latest known_words that was used, to build it only once per run
+expansion_index = {"known_words": None, "index": None}
+
+def get_expansion_index(known_words):
+    if expansion_index["known_words"] is not known_words:
+        expansion_index["index"] = ExpansionIndex(known_words)
+        expansion_index["known_words"] = known_words
+    return expansion_index["index"]
+
+# If the expansions can be looked up in the index, i.e. if is_known can only find them as known
+# words or compounds
+def can_use_expansion_index(word):
+    if "/" in word or word != word.strip() or word.rstrip(".") == "" or any([c.isdigit() for c in word]):
+        return False
+    # lower() of the expansion should be the same as lower() of its parts (which it is not e.g. for a final sigma)
+    return (word + "a").lower() == word.lower() + "a" and ("a" + word).lower() == "a" + word.lower()
+
+# Same as is_known(suggestion, "", ...) for the suggestions in get_all_expands_with_one_letter,
+# given if the suggestion is a known word according to the index
+def is_known_expansion(suggestion, is_known_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
+    lower_suggestion = suggestion.lower()
+    if lookup_recorder is not None:
+        lookup_recorder.looked_up.update([suggestion, lower_suggestion, suggestion.rstrip("."), lower_suggestion.rstrip(".")])
+    if is_known_word:
+        return True
+    is_compound = is_known_compound_function(lower_suggestion, "", known_words, spellchecker, one_letter_words)
+    if lookup_recorder is not None:
+        lookup_recorder.compounds[(lower_suggestion, "")] = is_compound
+    return is_compound
+
 def get_all_expands_with_one_letter(word, known_words, spellchecker, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function):
     all_expand_suggestions = []
     # Try to expand word with one letter, take the expansion most frequent in corpus
-    if len(word) > 3 and "-" not in word:
+    if len(word) > 3 and "-" not in word and can_use_expansion_index(word):
+        index = get_expansion_index(known_words)
+        lower_word = word.lower()
+        last_letters = index.last_letters.get(word, "")
+        lower_last_letters = index.last_letters.get(lower_word, "")
+        first_letters = index.first_letters.get(word, "") + index.first_letters.get(word.rstrip("."), "")
+        lower_first_letters = index.first_letters.get(lower_word, "") + index.first_letters.get(lower_word.rstrip("."), "")
+        for l in letters:
+            # Only suggestions that are frequent enough are kept, so the others are not checked
+            suggestion = word + l
+            if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, suggestion) and is_known_expansion(suggestion, l in last_letters or l.lower() in lower_last_letters, known_words, spellchecker, one_letter_words, is_known_compound_function):
+                all_expand_suggestions.append(suggestion)
+                
+            suggestion = l + word
+            if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, suggestion) and is_known_expansion(suggestion, l in first_letters or l.lower() in lower_first_letters, known_words, spellchecker, one_letter_words, is_known_compound_function):
+                all_expand_suggestions.append(suggestion)
+    elif len(word) > 3 and "-" not in word:
         for l in letters:
             suggestion = word + l
             if is_known(suggestion, "", known_words, spellchecker, one_letter_words, is_known_compound_function) and is_suggestion_frequent_enough(raw_freq, raw_freq_dict, suggestion):
@@ -164,6 +488,182 @@ def get_all_expands_with_one_letter(word, known_words, spellchecker, raw_freq_di
     return all_expand_suggestions
     
 
+#######################
+# Replacers
+# The left sides of the replacers are compiled into a trie, so that all positions where any of
+# them occurs in a word are found in one scan. Replacers that do not occur in the word are then
+# skipped (they would only give the word itself, which is already known to be unknown).
+# With max_replacer_variants > 0 in compare_folder, a replacer that occurs more than once is also
+# applied at one position at a time, for words where only one of the occurrences is an OCR
+# error. max_replacer_variants is the max number of such variants for a word.
+#######################
+
+max_replacer_variants = 0
+replacer_tries = {}
+
+def check_max_replacer_variants(max_variants):
+    if not isinstance(max_variants, int) or max_variants < 0:
+        print("max_replacer_variants should be an integer >= 0, not " + str(max_variants))
+        exit()
+
+def set_max_replacer_variants(max_variants):
+    global max_replacer_variants
+    check_max_replacer_variants(max_variants)
+    max_replacer_variants = max_variants
+
+class ReplacerTrie:
+    def __init__(self, replacers):
+        self.replacers = [(wrong, right) for (wrong, right) in replacers]
+        self.root = {}
+        self.always_matching = set() # replacers with an empty left side
+        for nr, (wrong, right) in enumerate(self.replacers):
+            if wrong == "":
+                self.always_matching.add(nr)
+                continue
+            node = self.root
+            for c in wrong:
+                node = node.setdefault(c, {})
+            # the key None holds the replacers ending at the node
+            node.setdefault(None, []).append(nr)
+
+    # (position, replacer nr) for each occurrence of the left side of a replacer
+    def find_matches(self, word):
+        matches = []
+        for start in range(len(word)):
+            node = self.root
+            for position in range(start, len(word)):
+                node = node.get(word[position])
+                if node is None:
+                    break
+                if None in node:
+                    for nr in node[None]:
+                        matches.append((start, nr))
+        return matches
+
+    # The word with all occurrences replaced (as word.replace), for each replacer that occurs in
+    # the word, in the order of the replacers, followed by at most max_variants variants with one
+    # occurrence replaced
+    def get_variants(self, word, max_variants=0):
+        matches = self.find_matches(word)
+        matched = self.always_matching.union([nr for (position, nr) in matches])
+        variants = [word.replace(self.replacers[nr][0], self.replacers[nr][1]) for nr in sorted(matched)]
+        if max_variants > 0:
+            seen = set(variants)
+            seen.add(word)
+            nr_of_one_position_variants = 0
+            for position, nr in matches:
+                if nr_of_one_position_variants >= max_variants:
+                    break
+                wrong, right = self.replacers[nr]
+                variant = word[:position] + right + word[position + len(wrong):]
+                if variant not in seen:
+                    seen.add(variant)
+                    variants.append(variant)
+                    nr_of_one_position_variants = nr_of_one_position_variants + 1
+        return variants
+
+def get_replacer_trie(replacers):
+    key = tuple([tuple(replacer) for replacer in replacers])
+    if key not in replacer_tries:
+        replacer_tries[key] = ReplacerTrie(replacers)
+    return replacer_tries[key]
+
+#######################
+# Generators of candidates for get_new_word
+#######################
+
+# The duplicated dividers would only give the same candidates again. When stripping a divider
+# does not change the word, is_known is only called once for the word
+def get_divider_candidates(word, next_word, known_words, spellchecker, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function):
+    candidates = []
+    word_is_known = None
+    for divider in unique_dividers:
+        stripped_word = word.strip(divider)
+        if stripped_word == word:
+            if word_is_known is None:
+                word_is_known = is_known(word, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function)
+            stripped_word_is_known = word_is_known
+        else:
+            stripped_word_is_known = is_known(stripped_word, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function)
+        if stripped_word_is_known:
+            if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, stripped_word):
+                new_word = word.replace(divider, " " + divider + " ")
+                candidates.append(new_word)
+    return candidates
+
+def get_dot_split_candidates(word, known_words, spellchecker, raw_freq_dict, raw_freq, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace):
+    candidates = []
+    dot_split = word.split(".")
+    if len(dot_split) == 2 and dot_split[0].isdigit():
+        without_dot = get_new_word(dot_split[1], "", known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
+        if without_dot:
+            if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, without_dot):
+                candidates.append(dot_split[0] + " . " + without_dot)
+    return candidates
+
+# Replace with one suggeston at a time
+def get_replacer_candidates(word, next_word, replacers, known_words, spellchecker, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function):
+    candidates = []
+    for suggestion in get_replacer_trie(replacers).get_variants(word, max_replacer_variants):
+        if is_known(suggestion, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
+                if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, suggestion):
+                    candidates.append(suggestion)
+    return candidates
+
+def get_without_hyphens_candidates(word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace):
+    candidates = []
+    if "k-k" in word or "-" in word or "." in word:
+        if not (word[-1] == "-" or word[-1] == ".") :
+            alpha_word = word.replace("k-k", "ck").translate(hyphen_and_dot_table)
+            new_word = get_new_word(alpha_word, "-", known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
+            if new_word:
+                candidates.append(new_word)
+    return candidates
+
+def get_hyphen_removed_candidates(word, known_words, spellchecker, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function):
+    candidates = []
+    if "-" in word[:-1]:
+        indices_object = hyphen_re.finditer(word)
+        indices = [index.start() for index in indices_object]
+        for index in indices:
+            removed = word[:index] + word[index + 1:]
+            if is_known(removed, "-", known_words, spellchecker, one_letter_words, is_known_compound_function):
+                if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, removed):
+                    candidates.append(removed)
+    return candidates
+
+def get_hyphen_parts_candidates(word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace):
+    candidates = []
+    if "-" in word:
+        parts = word.split("-")
+        new_str = []
+        all_found = True
+        for p in parts:
+            if len(p) < 5:
+                all_found = False
+            elif is_known(p, "", known_words, spellchecker, one_letter_words, is_known_compound_function):
+                new_str.append(p)
+            else:
+                new_w = get_new_word(p, "-", known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
+                if new_w:
+                    new_str.append(new_w)
+                else:
+                    all_found = False
+        if all_found:
+            new_compound = "-".join(new_str)
+            if new_compound != word:
+                candidates.append(new_compound)
+    return candidates
+
+# To capture incorrectly tokenized abbreviations
+def get_abbreviation_candidates(word, next_word, known_words, spellchecker, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function):
+    candidates = []
+    dot_suggestion = word + "."
+    if "-" not in word and "/" not in word and next_word != "-" and is_known(dot_suggestion, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
+            if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, dot_suggestion):
+                candidates.append(dot_suggestion)
+    return candidates
+
 def get_new_word(word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace):
     new_word_candidates = []
 
@@ -180,7 +680,7 @@ def get_new_word(word, next_word, known_words, spellchecker, raw_freq_dict, dist
                 return other + "-" + w_p[2]
 
     # Always replace "_" and "-" regardless of occurrences
-    word = word.replace("_", "").replace("-", "")
+    word = word.translate(underscore_and_hyphen_table)
     if is_known(word, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
         return word
 
@@ -193,35 +693,15 @@ def get_new_word(word, next_word, known_words, spellchecker, raw_freq_dict, dist
     if word[1] == "-": # u-land m.m. frequent error in correction
         return None
         
-    if word in raw_freq_dict:
+    if word in raw_freq_dict: # (word has no "_" left)
         raw_freq = raw_freq_dict[word]
-    elif word.replace("_", "") in raw_freq_dict:
-        raw_freq = raw_freq_dict[word.replace("_", "")]
     else:
         raw_freq = 0
 
   
-    for divider in dividers:
-        if is_known(word.strip(divider), next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
-            if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, word.strip(divider)):
-                new_word = word.replace(divider, " " + divider + " ")
-                new_word_candidates.append(new_word)
-    
-    dot_split = word.split(".")
-    if len(dot_split) == 2 and dot_split[0].isdigit():
-        without_dot = get_new_word(dot_split[1], "", known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
-        if without_dot:
-            if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, without_dot):
-                new_word_candidates.append(dot_split[0] + " . " + without_dot)
-            
-            
-  
-    # Replace with one suggeston at a time
-    for replacer in replacers:
-        suggestion = word.replace(replacer[0], replacer[1])
-        if is_known(suggestion, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
-                if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, suggestion):
-                    new_word_candidates.append(suggestion)
+    new_word_candidates.extend(get_divider_candidates(word, next_word, known_words, spellchecker, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function))
+    new_word_candidates.extend(get_dot_split_candidates(word, known_words, spellchecker, raw_freq_dict, raw_freq, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace))
+    new_word_candidates.extend(get_replacer_candidates(word, next_word, replacers, known_words, spellchecker, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function))
 
     # Try to expand word with one letter, take the expansion most frequent in corpus
     expanded = get_all_expands_with_one_letter(word, known_words, spellchecker, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function)
@@ -236,64 +716,30 @@ def get_new_word(word, next_word, known_words, spellchecker, raw_freq_dict, dist
         if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, el):
             new_word_candidates.append(el)
         
-
-    if "k-k" in word or "-" in word or "." in word:
-        if not (word[-1] == "-" or word[-1] == ".") :
-            alpha_word = word.replace("k-k", "ck").replace("-", "").replace(".", "")
-            new_word = get_new_word(alpha_word, "-", known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
-            if new_word:
-                new_word_candidates.append(new_word)
-
+    new_word_candidates.extend(get_without_hyphens_candidates(word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace))
 
     if len(new_word_candidates) == 0: # , and with only some hyphens removed
-        if "-" in word[:-1]:
-            indices_object = re.finditer(pattern='-', string=word)
-            indices = [index.start() for index in indices_object]
-            for index in indices:
-                removed = word[:index] + word[index + 1:]
-                if is_known(removed, "-", known_words, spellchecker, one_letter_words, is_known_compound_function):
-                    if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, removed):
-                        new_word_candidates.append(removed)
+        new_word_candidates.extend(get_hyphen_removed_candidates(word, known_words, spellchecker, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function))
 
     if len(new_word_candidates) == 0: #if still nothing found, try to look at individual parts between hyphens
-        if "-" in word:
-            parts = word.split("-")
-            new_str = []
-            all_found = True
-            for p in parts:
-                if len(p) < 5:
-                    all_found = False
-                elif is_known(p, "", known_words, spellchecker, one_letter_words, is_known_compound_function):
-                    new_str.append(p)
-                else:
-                    new_w = get_new_word(p, "-", known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
-                    if new_w:
-                        new_str.append(new_w)
-                    else:
-                        all_found = False
-            if all_found:
-                new_compound = "-".join(new_str)
-                if new_compound != word:
-                    new_word_candidates.append(new_compound)
+        new_word_candidates.extend(get_hyphen_parts_candidates(word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace))
                     
     if len(new_word_candidates) == 0:
-        # To capture incorrectly tokenized abbreviations
-        dot_suggestion = word + "."
-        if "-" not in word and "/" not in word and next_word != "-" and is_known(dot_suggestion, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
-                if is_suggestion_frequent_enough(raw_freq, raw_freq_dict, dot_suggestion):
-                    new_word_candidates.append(dot_suggestion)
+        new_word_candidates.extend(get_abbreviation_candidates(word, next_word, known_words, spellchecker, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function))
                 
 
     seen = set()
     final_candidates = []
+    candidate_set = set(new_word_candidates)
     for el in new_word_candidates:
         if el not in seen:
             identical_without_divider_exists = False
-            for d in dividers + ["-"]:
+            for d in dividers_and_hyphen:
                 if d in el:
                     identical_without_divider = el.replace(d, "").replace(" ", "")
-                    if identical_without_divider in new_word_candidates:
+                    if identical_without_divider in candidate_set:
                         identical_without_divider_exists = True
+                        break
             if not identical_without_divider_exists:
                 final_candidates.append(el)
                 seen.add(el)
@@ -308,13 +754,211 @@ def get_new_word(word, next_word, known_words, spellchecker, raw_freq_dict, dist
                 return final_candidates[0]
         
     return None
-    
+
+
+# The compound splitters in this module, which don't use next_word
+builtin_compound_functions = [is_known_compound_swedish, is_known_compound_german, is_known_compound, is_known_compound_swedish_indexed]
+
+# Apart from the compound splitter, next_word only influences get_new_word when it is "." or "-"
+# (abbreviations and hyphenated words), so with a built-in compound splitter all other next words
+# can share the same cache entry. Another splitter might use next_word, so then it is kept as it is.
+def get_next_word_class(next_word, is_known_compound_function):
+    if is_known_compound_function not in builtin_compound_functions:
+        return next_word
+    if next_word in [".", "-"]:
+        return next_word
+    if next_word.strip() == ".":
+        return " ."
+    return ""
+
+#######################
+# Profiling
+# With profile=True in compare_folder, the functions for each stage are replaced by timed versions
+# (so nothing is measured when profiling is off), and is_known counts which branch decided the
+# result. The times include the stages called from within a stage, e.g. is_known in get_new_word.
+# Recursive calls are only timed for the outermost call, but all calls are counted.
+#######################
+
+profiler = None
+
+# stage name -> function to time
+profiled_functions = [("replace_spaced_words", "replace_spaced_words"), ("more_alone_globbing", "more_alone_globbing"), ("tokenize", "tokenize_words"), ("is_known", "is_known"), ("get_new_word", "get_new_word"), ("get_new_word: dividers", "get_divider_candidates"), ("get_new_word: split at dot", "get_dot_split_candidates"), ("get_new_word: replacers", "get_replacer_candidates"), ("get_new_word: expand with one letter", "get_all_expands_with_one_letter"), ("get_new_word: spell checker", "get_all_candidates_from_spellchecker"), ("get_new_word: without hyphens", "get_without_hyphens_candidates"), ("get_new_word: hyphen removed", "get_hyphen_removed_candidates"), ("get_new_word: hyphen parts", "get_hyphen_parts_candidates"), ("get_new_word: abbreviation", "get_abbreviation_candidates"), ("spell checker candidates", "get_spellchecker_candidates"), ("write output", "write_output")]
+
+class Profiler:
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.is_known_branches = {}
+        self.running = set()
+        self.original_functions = {}
+
+    def timed(self, stage, function):
+        def timed_function(*args, **kwargs):
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+            if stage in self.running:
+                return function(*args, **kwargs)
+            self.running.add(stage)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[stage] = self.seconds.get(stage, 0) + time.perf_counter() - start
+                self.running.discard(stage)
+        return timed_function
+
+    def count_branch(self, branch):
+        self.is_known_branches[branch] = self.is_known_branches.get(branch, 0) + 1
+
+    # Returns what has been measured since the last call
+    def take(self):
+        measured = {"seconds": self.seconds, "calls": self.calls, "is_known_branches": self.is_known_branches}
+        self.seconds = {}
+        self.calls = {}
+        self.is_known_branches = {}
+        return measured
+
+def enable_profiling():
+    global profiler
+    disable_profiling()
+    profiler = Profiler()
+    for stage, function_name in profiled_functions:
+        profiler.original_functions[function_name] = globals()[function_name]
+        globals()[function_name] = profiler.timed(stage, globals()[function_name])
+
+def disable_profiling():
+    global profiler
+    if profiler is not None:
+        globals().update(profiler.original_functions)
+        profiler = None
+
+def take_profile():
+    if profiler is None:
+        return None
+    return profiler.take()
+
+def add_to_profile(profile, measured):
+    if measured is None:
+        return
+    for key in ["seconds", "calls", "is_known_branches"]:
+        if key not in profile:
+            profile[key] = {}
+        add_to_frequency_dictionary(profile[key], measured[key])
+
+def write_profile(output_folder, output_filename, profile, total_seconds, workers):
+    report = {"total_seconds": total_seconds, "workers": workers, "stages": {}, "is_known_branches": dict(sorted(profile.get("is_known_branches", {}).items(), key=lambda item: -item[1]))}
+    for stage, function_name in profiled_functions:
+        report["stages"][stage] = {"seconds": profile.get("seconds", {}).get(stage, 0), "calls": profile.get("calls", {}).get(stage, 0)}
+    profile_file_name = os.path.join(output_folder, "profile_" + os.path.splitext(output_filename)[0] + ".json")
+    with open(profile_file_name, "w") as profile_file:
+        json.dump(report, profile_file, indent=4)
+    print("Profile written to " + profile_file_name)
+
+# Recording of what the correction of a text depends on, used for incremental re-runs (see
+# the manifest below). When lookup_recorder is set, is_known and the spell checker record the
+# words they look up
+lookup_recorder = None
+
+class LookupRecorder:
+    def __init__(self):
+        self.looked_up = set() # words looked up in the known words
+        self.spellchecked = set() # words the spell checker has given candidates for
+        self.compounds = {} # (word, next_word) -> result of the compound function
+
+    def add(self, other):
+        self.looked_up.update(other.looked_up)
+        self.spellchecked.update(other.spellchecked)
+        self.compounds.update(other.compounds)
+
+# Call function, and return its result and the lookups it made. The lookups are also added
+# to the lookups of the caller, if they are recorded
+def record_lookups(function, *args):
+    global lookup_recorder
+    outer_recorder = lookup_recorder
+    lookup_recorder = LookupRecorder()
+    try:
+        result = function(*args)
+    finally:
+        recorded = lookup_recorder
+        lookup_recorder = outer_recorder
+    if outer_recorder is not None:
+        outer_recorder.add(recorded)
+    return result, recorded
+
+# LRU cache for get_new_word, to only resolve a frequent OCR error once per frequency window
+# When lookups are recorded, each entry also keeps the lookups made to resolve it
+class CorrectionCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Suggestions depend on the frequency dictionary, so clear the cache when it is changed
+    def clear(self):
+        self.entries.clear()
+
+    def get_new_word(self, word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace):
+        key = (word, get_next_word_class(next_word, is_known_compound_function))
+        if key in self.entries:
+            self.hits = self.hits + 1
+            self.entries.move_to_end(key)
+            new_word, recorded = self.entries[key]
+            if lookup_recorder is not None and recorded is not None:
+                lookup_recorder.add(recorded)
+            return new_word
+
+        self.misses = self.misses + 1
+        if lookup_recorder is not None:
+            new_word, recorded = record_lookups(get_new_word, word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
+        else:
+            new_word = get_new_word(word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
+            recorded = None
+        self.entries[key] = (new_word, recorded)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False) # remove the least recently used
+        return new_word
+
+# If a word is unknown (and should be corrected), and what to replace it with
+def resolve_word(word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct):
+    if is_known(word, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function) or word in not_to_correct:
+        return False, None
+    return True, get_new_word(word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
+
+# Table with the result of resolve_word for each (word, next word class) in a folder, resolved
+# for all words before the folder is corrected. Words that are not in the table (e.g. created
+# by replacing spaced words) are resolved when they occur. The entries are
+# (is_unknown, new_word, recorded lookups or None)
+class CorrectionTable:
+    def __init__(self, entries):
+        self.entries = entries
+        self.hits = 0
+        self.misses = 0
+
+    def resolve_word(self, word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct):
+        key = (word, get_next_word_class(next_word, is_known_compound_function))
+        if key in self.entries:
+            self.hits = self.hits + 1
+            is_unknown, new_word, recorded = self.entries[key]
+            if lookup_recorder is not None and recorded is not None:
+                lookup_recorder.add(recorded)
+            return is_unknown, new_word
+            
+        self.misses = self.misses + 1
+        if lookup_recorder is not None:
+            (is_unknown, new_word), recorded = record_lookups(resolve_word, word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct)
+        else:
+            is_unknown, new_word = resolve_word(word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct)
+            recorded = None
+        self.entries[key] = (is_unknown, new_word, recorded)
+        return is_unknown, new_word
+
 #######################
 # For replacing spaced words
 #######################
 def clean_word(word):
-    word = word.replace("z. B.", "").replace("u. a.", "").replace(".", "").replace(",", "").replace("!", "").replace("?", "").replace(":", "").replace("(", "").replace(")", "").replace(";", "").replace("„", "").replace('"', "").replace(":", "").replace("'", "").replace('“', "").replace('‘', "").replace('»', "").replace('«', "").replace('}', "").replace('{', "").replace('*', "").replace("”", "").replace("[", "").replace("]", "").replace("•","").replace("’","").replace("=","").replace(" ", "")
-    return word
+    if ". " in word:
+        word = word.replace("z. B.", "").replace("u. a.", "")
+    return word.translate(clean_word_table)
 
 def more_alone_globbing(sentence, known_words, spellchecker, replacers, space_replaced_dict, one_letter_words, is_known_compound_function):
     simple_tokens = sentence.split(" ")
@@ -352,44 +996,117 @@ def more_alone_globbing(sentence, known_words, spellchecker, replacers, space_re
 
             
 
+# Filters for what could be a spaced word
+def is_spaced_word_candidate(new_found):
+    if not clean_word(new_found).translate(hyphen_and_one_table).isalpha():
+        return False
+    for d in ["=", "•"]:
+        if d in new_found:
+            return False
+    if new_found.count("-") > 1:
+        return False
+    for p in new_found.split():
+        if p in ["dr", "in", "KG"]:
+            return False
+    return True
+
+# All substrings of a found spaced word with nr_of_spaces spaces that another spaced word can be equal to
+# (the parts between the spaces are at most two characters, so it starts and ends within a part)
+def get_spaced_word_substrings(found, nr_of_spaces):
+    parts = found.split(" ")
+    part_starts = []
+    pos = 0
+    for part in parts:
+        part_starts.append(pos)
+        pos = pos + len(part) + 1
+    substrings = set()
+    for first in range(len(parts) - nr_of_spaces):
+        last = first + nr_of_spaces
+        for start in range(part_starts[first], part_starts[first] + len(parts[first])):
+            for end in range(part_starts[last] + 1, part_starts[last] + len(parts[last]) + 1):
+                if start < end:
+                    substrings.add(found[start:end])
+    return substrings
+
+# Search for all spaced words, i.e. a single character, followed by up to max_nr_of_spaces tokens of
+# one or two characters, and ending with a single character, all separated by single spaces.
+# Spaced words with more tokens are searched for first, and words that are a substring of a
+# previously found spaced word are not kept
+def find_spaced_words(text, max_nr_of_spaces=200):
+    delimiters = "-\r\n" # can also be used before or after a spaced word, in addition to spaces
+
+    # Split the text into the parts between single spaces, and check what role each part can have
+    chunks = text.split(" ")
+    nr_of_chunks = len(chunks)
+    starts = []
+    start_bits = 0 # parts whose last character can start a spaced word
+    end_bits = 0 # parts whose first character can end a spaced word
+    delimiter_positions = [] # where the character before the start of a spaced word is
+    pos = 0
+    for nr, chunk in enumerate(chunks):
+        starts.append(pos)
+        if len(chunk) == 1:
+            delimiter_positions.append(max(pos - 1, 0))
+        else:
+            delimiter_positions.append(pos + len(chunk) - 2)
+        if nr < nr_of_chunks - 1 and (len(chunk) == 1 or (len(chunk) > 1 and chunk[-2] in delimiters)):
+            start_bits = start_bits | (1 << nr)
+        if len(chunk) == 1 or (len(chunk) > 1 and chunk[1] in delimiters):
+            end_bits = end_bits | (1 << nr)
+        pos = pos + len(chunk) + 1
+
+    # Number of one or two character parts directly following each part (at most max_nr_of_spaces)
+    run_bits = [0] * (max_nr_of_spaces + 1)
+    run = 0
+    for nr in range(nr_of_chunks - 1, -1, -1):
+        run_bits[run] = run_bits[run] | (1 << nr)
+        if 1 <= len(chunks[nr]) <= 2:
+            run = min(run + 1, max_nr_of_spaces)
+        else:
+            run = 0
+
+    all_found = []
+    # For each number of spaces, the substrings of the found spaced words with that number of spaces,
+    # and how many of the found spaced words have been added
+    found_substrings = {}
+    covered_until = [-1] * nr_of_chunks # for each part, the last part of a found spaced word covering it
+    long_enough_bits = 0
+    for nr_of_spaces in range(max_nr_of_spaces, 0, -1):
+        long_enough_bits = long_enough_bits | run_bits[nr_of_spaces]
+        match_bits = start_bits & long_enough_bits & (end_bits >> (nr_of_spaces + 1))
+        if match_bits == 0:
+            continue
+        matches = bin(match_bits)[:1:-1] # match_bits as a string, with the first part first
+        search_pos = 0
+        first = matches.find("1")
+        while first >= 0:
+            if delimiter_positions[first] < search_pos: # the delimiter before was used by the last match
+                first = matches.find("1", first + 1)
+                continue
+            last = first + nr_of_spaces + 1
+            search_pos = starts[last] + 2
+            # Skip spaced words lying within an already found one
+            if covered_until[first] < last:
+                new_found = text[starts[first] + len(chunks[first]) - 1:starts[last] + 1].strip()
+                if new_found != "" and is_spaced_word_candidate(new_found):
+                    # Also skip spaced words that are equal to a part of an already found one
+                    nr_of_spaces_found = new_found.count(" ")
+                    substrings, nr_added = found_substrings.get(nr_of_spaces_found, (set(), 0))
+                    for found in all_found[nr_added:]:
+                        substrings.update(get_spaced_word_substrings(found, nr_of_spaces_found))
+                    found_substrings[nr_of_spaces_found] = (substrings, len(all_found))
+                    if new_found not in substrings:
+                        all_found.append(new_found)
+                        for nr in range(first, last + 1):
+                            if covered_until[nr] < last:
+                                covered_until[nr] = last
+            first = matches.find("1", last)
+    return all_found
+
 def replace_spaced_words(text, known_words, spellchecker, replacers, space_replaced_dict, one_letter_words):
-    original_text = copy.copy(text)
     
     # First, search for all spaced words, only keep the longest
-    ranges = range(200, 0, -1)
-    all_found = [] # To save all candidates
-    for nr_of_spaces in ranges:
-        re_str = nr_of_spaces * " [^ ][^ ]?"
-        # (?: is non-capturing version of regular parentheses
-        re_to_use = r"(?: |^|-|\r|\n)([^ ]" + re_str + " [^ ])(?: |$|-|\r|\n)"
-        found = re.findall(re_to_use, text)
-        
-        if len(found) > 0:
-            for new_found in found:
-                new_found = new_found.strip()
-                if new_found == "":
-                    continue
-                parts = new_found.split()
-                add_found = True
-                if not clean_word(new_found).replace("-", "").replace("1", "").isalpha():
-                    add_found = False
-                
-                for d in ["=", "•"]:
-                    if d in new_found:
-                        add_found = False
-                
-                if new_found.count("-") > 1:
-                    add_found = False
-
-                for p in parts:
-                    if p in ["dr", "in", "KG"]:
-                        add_found = False
-
-                for previously_found in all_found:
-                    if new_found in previously_found: # substring of previously found
-                        add_found = False
-                if add_found:
-                    all_found.append(new_found)
+    all_found = find_spaced_words(text)
 
     
     all_spaced_split = []
@@ -471,36 +1188,51 @@ def is_hyphen_likely_word(word):
     return False
     
 def is_known(word, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
+    if lookup_recorder is not None:
+        lookup_recorder.looked_up.add(word)
     #spell_checker_output = spellchecker.unknown([word])
     #len(spell_checker_output) == 0 or
     if not next_word.strip() == "." and len(word) == 1 and word.isalpha() and word not in one_letter_words:
         if next_word != ".": # likely abbreviation
+            if profiler is not None:
+                profiler.count_branch("unknown one letter word")
             return False
-        else:
-            print(word, next_word)
     
-    for nr in [1, 2, 3, 4]:
-        if word in [el*nr for el in dividers]: # If it's only dividers in a word, consider it correct
-            return True
+    if word in repeated_dividers: # If it's only dividers in a word, consider it correct
+        if profiler is not None:
+            profiler.count_branch("only dividers")
+        return True
     
     # Compounds with numbers
-    string_without_digits = ''.join([i for i in word if not i.isdigit()])
+    string_without_digits = word.translate(digit_deletion_table)
     if word != string_without_digits and string_without_digits.isalpha() and len(word) - len(string_without_digits) > 1:
         if len(string_without_digits) > 6 and is_known(string_without_digits, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
+            if profiler is not None:
+                profiler.count_branch("compound with numbers")
             return True
         
-    if word.replace("-", "").replace("=", "").replace("_", "").replace("•", "").replace("—", "").replace(".", "").strip() == "":
+    if word.translate(only_hyphens_and_dots_table).strip() == "":
+        if profiler is not None:
+            profiler.count_branch("only hyphens and dots")
         return True
         
     word = word.strip()
     orig_word = word
     word = word.lower()
+    if lookup_recorder is not None:
+        lookup_recorder.looked_up.update([word, orig_word, word.rstrip("."), orig_word.rstrip(".")])
     if word in known_words or orig_word in known_words:
+        if profiler is not None:
+            profiler.count_branch("known word")
         return True
     if word.rstrip(".") in known_words or orig_word.rstrip(".") in known_words:
+        if profiler is not None:
+            profiler.count_branch("known word without dot")
         return True
         
-    if word.replace("-", "").replace("—", "").replace(".", "").replace(",", "").replace("°", "").replace(":", "").replace("Nr.", "").replace("g", "").replace("/", "").replace("'", "").isdigit():
+    if word.translate(number_table).isdigit():
+        if profiler is not None:
+            profiler.count_branch("number")
         return True
     if "/" in word:
         parts = word.split("/")
@@ -509,10 +1241,17 @@ def is_known(word, next_word, known_words, spellchecker, one_letter_words, is_kn
             if not is_known(part, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
                 missing_subword = True
         if not missing_subword:
+            if profiler is not None:
+                profiler.count_branch("known parts around /")
             return True
             
-    if is_known_compound_function(word, next_word, known_words, spellchecker, one_letter_words):
+    is_compound = is_known_compound_function(word, next_word, known_words, spellchecker, one_letter_words)
+    if lookup_recorder is not None:
+        lookup_recorder.compounds[(word, next_word)] = is_compound
+    if is_compound:
     #if is_known_compound(word, next_word, known_words, spellchecker, one_letter_words):
+        if profiler is not None:
+            profiler.count_branch("compound")
         return True
     
     if "-" in orig_word:
@@ -520,6 +1259,8 @@ def is_known(word, next_word, known_words, spellchecker, one_letter_words, is_kn
         #    return True
             
         if is_hyphen_likely_word(orig_word):
+            if profiler is not None:
+                profiler.count_branch("hyphen likely word")
             return True
             
         all_subwords_known = True
@@ -533,27 +1274,139 @@ def is_known(word, next_word, known_words, spellchecker, one_letter_words, is_kn
             elif not is_known(sub_word, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function):
                 all_subwords_known = False
         if all_subwords_known:
+            if profiler is not None:
+                profiler.count_branch("known parts around -")
             return True
  
+    if profiler is not None:
+        profiler.count_branch("unknown")
     return False
     
     
 #####################
-# Main function for searching words not in terminologies
+# Tokenization
+# With tokenizer="builtin", the text is split at whitespace, and each chunk between whitespace
+# is tokenized with NLTK's word tokenizer rules only once, and then looked up. The rules only
+# look at the whitespace characters around a chunk, except for the final period, so the last
+# chunks are tokenized together with the end of the sentence. Chunks with only letters and
+# digits are kept as they are. The sentences are split by NLTK (punkt) as in word_tokenize,
+# but only for lines that can contain several sentences. If the punkt data is not installed,
+# each line is treated as one sentence, as word_tokenize(line, preserve_line=True).
 ####################
 
-def search_not_found(text, known_words, not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct):
-    text = text.replace("\r", "\n").replace("  ", " ")
-    sentences = text.split("\n")
-    
-    not_found_for_text_dict = {}
-    not_found_for_text_after_corrected_dict = {}
-    nr_of_words = 0
-    new_text = [] # to add tokens in a new created text
+use_builtin_tokenizer = False
+treebank_tokenizer = None
+word_chunk_re = re.compile(r"\w+")
+contraction_chunk_re = re.compile(r"(?i)cannot|gimme|gonna|gotta|lemme|wanna") # split by NLTK
+chunk_re = re.compile(r"\S+")
+sentence_end_characters = [".", "?", "!"]
+final_period_characters = set("])}>\"'»”’") # characters that can follow a final period
+chunk_tokens_cache = {}
+max_chunk_tokens_cache_size = 1000000
+punkt_available = None
+
+def check_tokenizer(tokenizer):
+    if tokenizer not in ["nltk", "builtin"]:
+        print("Unknown tokenizer " + str(tokenizer) + ", use 'nltk' or 'builtin'")
+        exit()
+
+def set_tokenizer(tokenizer):
+    global use_builtin_tokenizer
+    check_tokenizer(tokenizer)
+    use_builtin_tokenizer = tokenizer == "builtin"
+
+def tokenize_words(text):
+    if use_builtin_tokenizer:
+        return builtin_word_tokenize(text)
+    return import_lazily("word_tokenize")(text)
+
+def is_punkt_available():
+    global punkt_available
+    if punkt_available is None:
+        try:
+            import_lazily("sent_tokenize")("Test.")
+            punkt_available = True
+        except LookupError:
+            print("The NLTK punkt data is not installed, so the built-in tokenizer treats each line as one sentence")
+            punkt_available = False
+    return punkt_available
+
+def builtin_word_tokenize(text):
+    if not is_punkt_available():
+        return tokenize_sentence(text)
+    # punkt only splits at the sentence end characters, and strips trailing whitespace
+    if not any([c in text for c in sentence_end_characters]):
+        return tokenize_sentence(text.rstrip())
+    tokens = []
+    for sentence in import_lazily("sent_tokenize")(text):
+        tokens.extend(tokenize_sentence(sentence))
+    return tokens
+
+# The tokens are returned from a local variable, and not looked up again, so that the cache being
+# cleared by another thread in between can not give a KeyError
+def get_chunk_tokens(key, text_to_tokenize, has_end_marker):
+    global treebank_tokenizer
+    tokens = chunk_tokens_cache.get(key)
+    if tokens is None:
+        if treebank_tokenizer is None:
+            treebank_tokenizer = import_lazily("NLTKWordTokenizer")()
+        if len(chunk_tokens_cache) >= max_chunk_tokens_cache_size:
+            chunk_tokens_cache.clear()
+        tokens = treebank_tokenizer.tokenize(text_to_tokenize)
+        if has_end_marker:
+            tokens = tokens[:-1]
+        chunk_tokens_cache[key] = tokens
+    return tokens
+
+# Gives the same tokens as NLTK's word tokenizer for one sentence
+def tokenize_sentence(sentence):
+    chunks = [(match.start(), match.end()) for match in chunk_re.finditer(sentence)]
     
-    for sentence in sentences:
+    # The final period can be followed by chunks with closing brackets and quotes, so these are
+    # tokenized together with the last chunk with other characters
+    tail_nr = len(chunks) - 1
+    while tail_nr > 0 and all([c in final_period_characters for c in sentence[chunks[tail_nr][0]:chunks[tail_nr][1]]]):
+        tail_nr = tail_nr - 1
         
+    tokens = []
+    for chunk_nr, (start, end) in enumerate(chunks):
+        chunk = sentence[start:end]
+        if word_chunk_re.fullmatch(chunk) and not contraction_chunk_re.fullmatch(chunk):
+            if chunk_nr < tail_nr or chunk_nr == len(chunks) - 1:
+                tokens.append(chunk)
+                continue
+        before = sentence[start - 1] if start > 0 else ""
+        if chunk_nr < tail_nr:
+            # The "x" after the whitespace makes sure the chunk is not at the end of the sentence
+            after = sentence[end]
+            tokens.extend(get_chunk_tokens((before, chunk, after), before + chunk + after + "x", True))
+        else:
+            tail = sentence[start:]
+            tokens.extend(get_chunk_tokens((before, tail, None), before + tail, False))
+            break
+    return tokens
+
+#####################
+# Main function for searching words not in terminologies
+####################
+
+# Correct the lines one at a time, and yield (corrected line, number of words in the line).
+# token_lines are the tokens for each line from the frequency pass (or None). They are used
+# instead of tokenizing again, for the lines that are not changed before the tokenization
+def correct_lines(lines, known_words, not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct, not_found_for_text_dict, not_found_for_text_after_corrected_dict, correction_cache=None, token_lines=None, correction_table=None):
+    if token_lines is not None:
+        token_lines = iter(token_lines)
+    
+    for raw_sentence in lines:
+        text_tokens = None
+        if token_lines is not None:
+            text_tokens = next(token_lines, None)
+            if text_tokens is None:
+                token_lines = None
+                
+        nr_of_words = 0
         updated_sentence = []
+        sentence = raw_sentence.replace("  ", " ")
         sentence, all_replaced = replace_spaced_words(sentence, known_words, spellchecker, replacers, space_replaced_dict, one_letter_words)
         
         sentence = sentence.strip()
@@ -562,20 +1415,27 @@ def search_not_found(text, known_words, not_found_dict, not_found_dict_corrected
         sentence = more_alone_globbing(sentence, known_words, spellchecker, replacers, space_replaced_dict, one_letter_words, is_known_compound_function)
         changed_at_least_one = False
         
-        tokens = word_tokenize(sentence)
+        if text_tokens is not None and sentence == raw_sentence:
+            tokens = text_tokens
+        else:
+            tokens = tokenize_words(sentence)
         for word_nr, word in enumerate(tokens):
             if word_nr >= len(tokens) - 1:
                 next_word = ""
             else:
                 next_word = tokens[word_nr + 1]
             to_print = False
-            if (len(word) == 1 or word[0] == "-") and word not in dividers and word not in ["&", "—", "%", "-", "’"] and not word.isdigit():
+            if (len(word) == 1 or word[0] == "-") and word not in divider_set and word not in not_error_characters and not word.isdigit():
 
                 to_print = True
-            if word not in dividers: # Don't include dividers in the statics
+            if word not in divider_set: # Don't include dividers in the statics
                 nr_of_words = nr_of_words + 1
                 
-            if not is_known(word, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function) and not word in not_to_correct:
+            if correction_table is not None:
+                word_is_unknown, table_new_word = correction_table.resolve_word(word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct)
+            else:
+                word_is_unknown = not is_known(word, next_word, known_words, spellchecker, one_letter_words, is_known_compound_function) and not word in not_to_correct
+            if word_is_unknown:
                 #if to_print:
                 #    print("Not known\n")
                 # Add statics of word not found
@@ -590,7 +1450,12 @@ def search_not_found(text, known_words, not_found_dict, not_found_dict_corrected
                     not_found_dict[word] = not_found_dict[word] + 1
                    
                 # Try to find a new word
-                new_word = get_new_word(word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
+                if correction_table is not None:
+                    new_word = table_new_word
+                elif correction_cache is not None:
+                    new_word = correction_cache.get_new_word(word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
+                else:
+                    new_word = get_new_word(word, next_word, known_words, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace)
           
                 if new_word: # An alterantive word found
                     updated_sentence.append(new_word)
@@ -621,20 +1486,53 @@ def search_not_found(text, known_words, not_found_dict, not_found_dict_corrected
                 updated_sentence.append(word.replace("_", ""))
                 
         if changed_at_least_one:
-            new_text.append(TreebankWordDetokenizer().detokenize(updated_sentence))
-            #new_text.append(" ".join(updated_sentence))
+            yield import_lazily("TreebankWordDetokenizer")().detokenize(updated_sentence), nr_of_words
+            #yield " ".join(updated_sentence), nr_of_words
         else:
-            new_text.append(sentence)
+            yield sentence, nr_of_words
+
+# Split a text in lines, as when it is read from a file
+def get_lines(text):
+    return text.replace("\r", "\n").split("\n")
+
+# Read the lines of a file one at a time. Gives the same lines as get_lines for the whole file
+# content, also for "\r" and "\r\n" line endings, which are turned into "\n" when reading
+def read_lines(file_name, encoding='utf-8-sig'):
+    with open(file_name, encoding=encoding) as opened:
+        line = "\n"
+        for line in opened:
+            yield line.rstrip("\n")
+        if line.endswith("\n"):
+            yield ""
+
+def get_error_proportions(not_found_for_text_dict, not_found_for_text_after_corrected_dict, nr_of_words):
+    nr_of_not_found = sum(not_found_for_text_dict.values())
+    error_proportion = nr_of_not_found/nr_of_words
+    nr_of_not_found_corrected = sum(not_found_for_text_after_corrected_dict.values())
+    error_proportion_after_corrected = nr_of_not_found_corrected/nr_of_words
+    return error_proportion, error_proportion_after_corrected
+
+def search_not_found(text, known_words, not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct, correction_cache=None, text_tokens=None, correction_table=None):
+    # text_tokens are the tokens for each line in text from the frequency pass
+    lines = get_lines(text)
+    if text_tokens is not None and len(text_tokens) != len(lines):
+        text_tokens = None
+    
+    not_found_for_text_dict = {}
+    not_found_for_text_after_corrected_dict = {}
+    nr_of_words = 0
+    new_text = [] # to add tokens in a new created text
+    
+    for new_sentence, nr_of_words_in_sentence in correct_lines(lines, known_words, not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct, not_found_for_text_dict, not_found_for_text_after_corrected_dict, correction_cache, text_tokens, correction_table):
+        new_text.append(new_sentence)
+        nr_of_words = nr_of_words + nr_of_words_in_sentence
        
     new_text_str =  "\n".join(new_text)
 
     if nr_of_words == 0:
         return None, None, 1, 1, 0, ""
         
-    nr_of_not_found = sum(not_found_for_text_dict.values())
-    error_proportion = nr_of_not_found/nr_of_words
-    nr_of_not_found_corrected = sum(not_found_for_text_after_corrected_dict.values())
-    error_proportion_after_corrected = nr_of_not_found_corrected/nr_of_words
+    error_proportion, error_proportion_after_corrected = get_error_proportions(not_found_for_text_dict, not_found_for_text_after_corrected_dict, nr_of_words)
     return not_found_for_text_dict, not_found_for_text_after_corrected_dict, error_proportion, error_proportion_after_corrected, nr_of_words, new_text_str
 
 ###########
@@ -667,25 +1565,276 @@ def get_known_words(terminologies_file_name, to_exclude_from_terminology):
     known_words = set(known_words)
     print("Nr of words in word lists: ", len(known_words))
     return known_words
+
+# Initialize spellChecker, with the known words added
+# The words in the dictionary of pyspellchecker for language. As in get_spellchecker, SpellChecker
+# uses the English dictionary for a language it has no dictionary for
+def get_spellchecker_language_words(language):
+    if language.lower() not in import_lazily("SpellChecker").languages():
+        print("There is no built-in spelling correction for the language " + language + ". The spelling correction will rely entirely on the word lists you provide.")
+        language = "en"
+    compressed = import_lazily("pkgutil").get_data("spellchecker", "resources/" + language.lower() + ".json.gz")
+    return json.loads(import_lazily("gzip").decompress(compressed).decode("utf-8")).keys()
+
+def get_spellchecker(language, distance, known_words, use_symspell=False):
+    # With use_symspell, the words are instead indexed by the SymSpellChecker, which also handles
+    # long words and distance 3 (distance = 0 means no spell checker)
+    if use_symspell and distance > 0:
+        return SymSpellChecker(itertools.chain(get_spellchecker_language_words(language), known_words), distance)
+    spellchecker_class = import_lazily("SpellChecker")
+    try:
+        spellchecker = spellchecker_class(language=language, distance=distance)
+    except ValueError:
+        print("There is no built-in spelling correction for the language " + language + ". The spelling correction will rely entirely on the word lists you provide.")
+        spellchecker = spellchecker_class(local_dictionary = "", distance=distance)
         
-    
+    # distance = 0 means no spell checker, so then the words are not needed
+    if distance > 0:
+        spellchecker.word_frequency.load_words(list(known_words))
+    return spellchecker
+
+# Hash of the word lists and the excluded words, to know if a compiled lexicon is up to date
+def get_word_lists_hash(terminologies_file_name, to_exclude_from_terminology):
+    word_lists_hash = hashlib.sha256()
+    with open(terminologies_file_name) as terminology_file:
+        for file_name in terminology_file.readlines():
+            file_name = file_name.strip()
+            word_lists_hash.update(file_name.encode("utf-8") + b"\0")
+            with open(file_name, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    word_lists_hash.update(block)
+            word_lists_hash.update(b"\0")
+    for word in sorted(to_exclude_from_terminology):
+        word_lists_hash.update(word.encode("utf-8") + b"\0")
+    return word_lists_hash.digest()
+
+##############
+# Compiled lexicon, so that large word lists don't have to be read and turned into a set on each run
+#
+# File format (little-endian):
+#   magic (8 bytes) | sha256 of the word lists (32 bytes) | nr of words (8 bytes)
+#   | offsets of the words in the word data (nr of words + 1, 8 bytes each)
+#   | word data (the words, utf-8 encoded, sorted and deduplicated)
 ##############
-# Main function below + small help function to that method (compare_folder)
-###############
 
-def get_year_number(file_path):
-    year, number = os.path.basename(file_path).split("_vol")
-    nr_year = "".join([c for c in year if c.isdigit()])
-    nr_number = "".join([c for c in number if c.isdigit()])
-    year_number = float(nr_year + "." + nr_number)
-    return str(year_number)
+lexicon_magic = b"OCRLEX1\0"
+lexicon_header = struct.Struct("<8s32sQ")
 
-#Not used currently
-def get_confidence_interval(proportion, nr_of_observed):
-    print("proportion", nr_of_observed)
-    print("nr_of_observed", nr_of_observed)
-    if nr_of_observed == 0:
-        return (0,0)
+def compile_lexicon(terminologies_file_name, lexicon_file_name, to_exclude_from_terminology=[]):
+    if not os.path.exists(terminologies_file_name):
+        print("The file " + terminologies_file_name + " does not exist")
+        exit()
+    known_words = get_known_words(terminologies_file_name, to_exclude_from_terminology)
+    encoded_words = sorted([word.encode("utf-8", "surrogatepass") for word in known_words])
+    
+    offsets = array.array("Q", [0])
+    for encoded_word in encoded_words:
+        offsets.append(offsets[-1] + len(encoded_word))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+        
+    with open(lexicon_file_name, "wb") as lexicon_file:
+        lexicon_file.write(lexicon_header.pack(lexicon_magic, get_word_lists_hash(terminologies_file_name, to_exclude_from_terminology), len(encoded_words)))
+        lexicon_file.write(offsets.tobytes())
+        for encoded_word in encoded_words:
+            lexicon_file.write(encoded_word)
+    print("Compiled " + str(len(encoded_words)) + " words to " + lexicon_file_name)
+
+# A compiled lexicon, opened with mmap. Can be used instead of the set of known words, as it
+# supports "in", len() and iteration, with membership checked by binary search in the file
+class Lexicon:
+    def __init__(self, lexicon_file_name):
+        self.lexicon_file_name = lexicon_file_name
+        with open(lexicon_file_name, "rb") as lexicon_file:
+            self.mm = mmap.mmap(lexicon_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.word_lists_hash, self.nr_of_words = lexicon_header.unpack_from(self.mm, 0)
+        if magic != lexicon_magic:
+            raise ValueError(lexicon_file_name + " is not a compiled lexicon")
+        offsets_start = lexicon_header.size
+        self.words_start = offsets_start + 8*(self.nr_of_words + 1)
+        if sys.byteorder == "little":
+            self.offsets = memoryview(self.mm)[offsets_start:self.words_start].cast("Q")
+        else:
+            self.offsets = array.array("Q", self.mm[offsets_start:self.words_start])
+            self.offsets.byteswap()
+
+    # mmap can't be pickled (e.g. when sent to worker processes), so the file is opened again
+    def __getstate__(self):
+        return self.lexicon_file_name
+
+    def __setstate__(self, lexicon_file_name):
+        self.__init__(lexicon_file_name)
+
+    def __len__(self):
+        return self.nr_of_words
+
+    def get_word(self, nr):
+        return self.mm[self.words_start + self.offsets[nr]:self.words_start + self.offsets[nr + 1]].decode("utf-8", "surrogatepass")
+
+    def __iter__(self):
+        for nr in range(self.nr_of_words):
+            yield self.get_word(nr)
+
+    def __contains__(self, word):
+        encoded_word = word.encode("utf-8", "surrogatepass")
+        mm = self.mm
+        offsets = self.offsets
+        words_start = self.words_start
+        low = 0
+        high = self.nr_of_words
+        while low < high:
+            middle = (low + high) // 2
+            middle_word = mm[words_start + offsets[middle]:words_start + offsets[middle + 1]]
+            if middle_word < encoded_word:
+                low = middle + 1
+            elif middle_word > encoded_word:
+                high = middle
+            else:
+                return True
+        return False
+
+    def close(self):
+        if isinstance(self.offsets, memoryview):
+            self.offsets.release()
+        self.mm.close()
+
+def open_lexicon(lexicon_file_name, terminologies_file_name, to_exclude_from_terminology):
+    if not os.path.exists(lexicon_file_name):
+        print("The lexicon " + lexicon_file_name + " does not exist. Create it with compile_lexicon")
+        exit()
+    lexicon = Lexicon(lexicon_file_name)
+    if lexicon.word_lists_hash != get_word_lists_hash(terminologies_file_name, to_exclude_from_terminology):
+        print("The lexicon " + lexicon_file_name + " was compiled from other word lists than the ones in " + terminologies_file_name + ". Run compile_lexicon again")
+        exit()
+    print("Nr of words in lexicon: ", len(lexicon))
+    return lexicon
+        
+    
+#############################
+# Bounded statistics for words not found
+# With max_not_found_words in compare_folder, the words not found in the whole corpus are not
+# counted in dicts (which can grow to millions of OCR errors that only occur once), but in a
+# HeavyHitters. Their counts are estimated with a Count-Min sketch (with conservative update, so
+# the estimates are never too low, and seldom much too high), only the max_not_found_words words
+# with the highest estimated counts are kept, and the number of unique words is estimated with a
+# HyperLogLog. So the memory used does not grow with the corpus. The words not found in each file,
+# and thus the error proportions, are still counted exactly.
+#############################
+
+count_min_depth = 4
+count_min_width = 1 << 20
+hyperloglog_precision = 14 # 2^14 registers, which gives a standard error of about 1%
+
+class HeavyHitters:
+    def __init__(self, max_words, width=count_min_width, depth=count_min_depth):
+        np = import_lazily("np")
+        self.max_words = max_words
+        self.width = width
+        self.depth = depth
+        self.counts = np.zeros((depth, width), dtype=np.int32)
+        self.top_words = {} # word -> estimated count
+        self.heap = [] # (estimated count, word) for the top words, and outdated entries
+        self.registers = np.zeros(1 << hyperloglog_precision, dtype=np.uint8)
+        
+    def add(self, word, nr):
+        self.add_counts({word: nr})
+        
+    # The hashes are computed for each word, and the sketch and the registers are updated for
+    # all words at once
+    def add_counts(self, count_dict):
+        if not count_dict:
+            return
+        np = import_lazily("np")
+        words = list(count_dict.keys())
+        
+        # Two 32 bit hashes for the HyperLogLog, and one for each row in the Count-Min sketch
+        digest_size = 4*(2 + self.depth)
+        digests = b"".join([hashlib.blake2b(word.encode("utf-8", "surrogatepass"), digest_size=digest_size).digest() for word in words])
+        hashes = np.frombuffer(digests, dtype="<u4").reshape(len(words), 2 + self.depth).astype(np.int64)
+        self.add_to_registers(hashes[:, 0], hashes[:, 1])
+        
+        # Conservative update: the counters are only increased up to the new estimates. The
+        # estimates are made before any counter is updated, so each counter stays at least as
+        # high as the count of any word hashed to it, also when two of the words share it
+        rows = np.broadcast_to(np.arange(self.depth), (len(words), self.depth))
+        columns = hashes[:, 2:] % self.width
+        estimates = self.counts[rows, columns].min(axis=1) + np.fromiter(count_dict.values(), dtype=np.int64, count=len(words))
+        np.maximum.at(self.counts, (rows, columns), np.broadcast_to(estimates[:, None], (len(words), self.depth)).astype(np.int32))
+        
+        # Only words estimated to be more frequent than the least frequent top word can become top words
+        threshold = self.get_least_frequent_count()
+        for word, estimate in zip(words, estimates.tolist()):
+            if estimate > threshold or word in self.top_words:
+                self.add_to_top_words(word, estimate)
+                
+    # The count of the least frequent top word, or -1 if there is room for more top words
+    def get_least_frequent_count(self):
+        if len(self.top_words) < self.max_words:
+            return -1
+        # Remove the outdated entries, to find the least frequent top word
+        while self.top_words.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0]
+            
+    def add_to_top_words(self, word, estimate):
+        if word in self.top_words or len(self.top_words) < self.max_words:
+            self.top_words[word] = estimate
+            heapq.heappush(self.heap, (estimate, word))
+        elif estimate > self.get_least_frequent_count():
+            least_frequent_word = heapq.heappop(self.heap)[1]
+            del self.top_words[least_frequent_word]
+            self.top_words[word] = estimate
+            heapq.heappush(self.heap, (estimate, word))
+        if len(self.heap) > 4*self.max_words + 16:
+            self.heap = [(estimate, word) for (word, estimate) in self.top_words.items()]
+            heapq.heapify(self.heap)
+            
+    # The register is given by the first bits of first_hashes, and the rank is the position of
+    # the first 1 bit in second_hashes
+    def add_to_registers(self, first_hashes, second_hashes):
+        np = import_lazily("np")
+        register_nrs = first_hashes >> (32 - hyperloglog_precision)
+        bit_lengths = np.zeros(len(second_hashes), dtype=np.int64)
+        nonzero = second_hashes > 0
+        bit_lengths[nonzero] = np.floor(np.log2(second_hashes[nonzero])).astype(np.int64) + 1
+        np.maximum.at(self.registers, register_nrs, (32 - bit_lengths + 1).astype(np.uint8))
+            
+    def get_nr_of_unique(self):
+        m = len(self.registers)
+        estimate = 0.7213/(1 + 1.079/m)*m*m/float((2.0**-self.registers.astype(float)).sum())
+        nr_of_empty_registers = int((self.registers == 0).sum())
+        if estimate <= 2.5*m and nr_of_empty_registers > 0: # few words, so count the empty registers instead
+            estimate = m*math.log(m/nr_of_empty_registers)
+        return int(round(estimate))
+        
+    # The top words, with their estimated counts
+    def items(self):
+        return self.top_words.items()
+
+# Add the counts in count_dict_to_add to count_dict, which is a dict or a HeavyHitters
+def add_counts(count_dict, count_dict_to_add):
+    if isinstance(count_dict, HeavyHitters):
+        count_dict.add_counts(count_dict_to_add)
+    else:
+        add_to_frequency_dictionary(count_dict, count_dict_to_add)
+
+##############
+# Main function below + small help function to that method (compare_folder)
+###############
+
+def get_year_number(file_path):
+    year, number = os.path.basename(file_path).split("_vol")
+    nr_year = "".join([c for c in year if c.isdigit()])
+    nr_number = "".join([c for c in number if c.isdigit()])
+    year_number = float(nr_year + "." + nr_number)
+    return str(year_number)
+
+#Not used currently
+def get_confidence_interval(proportion, nr_of_observed):
+    print("proportion", nr_of_observed)
+    print("nr_of_observed", nr_of_observed)
+    if nr_of_observed == 0:
+        return (0,0)
         
     intervall = 1.96 * math.sqrt(proportion*(1-proportion)/nr_of_observed)
     min = proportion - intervall
@@ -697,7 +1846,7 @@ def get_confidence_interval(proportion, nr_of_observed):
     return (min, max)
     
 def plot_output(file_names, error_props, all_nr_of_words, colors, output_folder, output_filename, okay_error_proportion):
-
+    plt = import_lazily("plt")
     plt.bar(file_names, error_props, color=colors)
         
     plt.ylim(-0.05, 0.5)
@@ -737,8 +1886,12 @@ def write_error_propotion_to_file(write_to, error_props, file_names, all_nr_of_w
 # Help function for error frequency statistics to file
 def write_frequencty_of_not_found(write_to, not_found_dict):
     not_found_list = sorted([(nr, word) for (word, nr) in not_found_dict.items() if nr > 1], reverse=True)
-    write_to.write("\t".join(["\nNr of unique not found: ", str(len(not_found_dict.keys())), "\n"]))
-    write_to.write("Not found freq > 1" +  "\n")
+    if isinstance(not_found_dict, HeavyHitters):
+        write_to.write("\t".join(["\nNr of unique not found (estimated): ", str(not_found_dict.get_nr_of_unique()), "\n"]))
+        write_to.write("Not found freq > 1 (estimated, for the " + str(not_found_dict.max_words) + " most frequent)" +  "\n")
+    else:
+        write_to.write("\t".join(["\nNr of unique not found: ", str(len(not_found_dict.keys())), "\n"]))
+        write_to.write("Not found freq > 1" +  "\n")
     write_to.write("==================================\n")
     previous_not_found_nr = math.inf
     for nr, word in not_found_list:
@@ -746,59 +1899,845 @@ def write_frequencty_of_not_found(write_to, not_found_dict):
             write_to.write("\n" + str(nr) + "\n")
             previous_not_found_nr = nr
         write_to.write(word + "\n")
+
+# Help function for writing how often the correction cache was used
+# The counts depend on how the files are divided between the workers (each has its own cache),
+# and files not corrected again (with a manifest) are not counted, so they are written to a file
+# of their own, and not with the other statistics
+def write_correction_cache_statistics(write_to, hits, misses, nr_of_files_corrected, nr_of_files, workers):
+    write_to.write("\nCorrection cache\n")
+    write_to.write("==================================\n")
+    write_to.write("\t".join(["Hits: ", str(hits), "\n"]))
+    write_to.write("\t".join(["Misses: ", str(misses), "\n"]))
+    write_to.write("\t".join(["Files corrected: ", str(nr_of_files_corrected), "of", str(nr_of_files), "\n"]))
+    write_to.write("\t".join(["Workers: ", str(workers), "\n"]))
  
-def get_raw_frequency(folder):
+# Keeps the tokens from the frequency pass, so that they can be reused when correcting the files.
+# Each line is stored as one string with the tokens separated by space (tokens don't contain
+# white space). When more than max_tokens_in_memory tokens are stored, the tokens are instead
+# written to a temporary folder.
+class TokenStore:
+    def __init__(self, max_tokens_in_memory):
+        self.max_tokens_in_memory = max_tokens_in_memory
+        self.nr_of_tokens_in_memory = 0
+        self.in_memory = {}
+        self.spilled = {}
+        self.spill_folder = None
+
+    # text_tokens can be a generator, so that a large file is never kept in memory. If the file
+    # does not fit within max_tokens_in_memory, it is written to disk while it is read
+    def add(self, file_name, text_tokens):
+        lines = []
+        nr_of_tokens = 0
+        spill_file = None
+        for tokens in text_tokens:
+            if spill_file is not None:
+                spill_file.write("\n" + " ".join(tokens))
+                continue
+            lines.append(" ".join(tokens))
+            nr_of_tokens = nr_of_tokens + len(tokens)
+            if self.nr_of_tokens_in_memory + nr_of_tokens > self.max_tokens_in_memory:
+                spill_file = self.open_spill_file(file_name)
+                spill_file.write("\n".join(lines))
+                lines = None
+        if spill_file is not None:
+            spill_file.close()
+        else:
+            self.in_memory[file_name] = lines
+            self.nr_of_tokens_in_memory = self.nr_of_tokens_in_memory + nr_of_tokens
+
+    def open_spill_file(self, file_name):
+        if self.spill_folder is None:
+            self.spill_folder = tempfile.mkdtemp(prefix="tokens_")
+        spill_file_name = os.path.join(self.spill_folder, str(len(self.spilled)) + ".txt")
+        self.spilled[file_name] = spill_file_name
+        return open(spill_file_name, "w", encoding="utf-8")
+
+    # Returns an iterator over the tokens for each line, or None if the file has not been stored
+    def get(self, file_name):
+        if file_name in self.in_memory:
+            return self.tokens_for_lines(self.in_memory[file_name])
+        elif file_name in self.spilled:
+            return self.tokens_for_lines(read_lines(self.spilled[file_name], "utf-8"))
+        return None
+
+    def tokens_for_lines(self, lines):
+        for line in lines:
+            if line != "":
+                yield line.split(" ")
+            else:
+                yield []
+
+    def remove_spilled(self):
+        if self.spill_folder is not None:
+            shutil.rmtree(self.spill_folder)
+            self.spill_folder = None
+            self.spilled = {}
+
+def get_raw_frequency(folder, token_store=None):
     print("Getting frequencies")
     raw_freq_dict = {}
     
     files = sorted(glob.glob(os.path.join(folder, "*.txt")))
     for f in files:
-        with open(f, encoding='utf-8-sig') as opened:
-            content = opened.read()
-            content = content.replace("\r", "\n")
-            paragraphs = content.split("\n")
-            for para in paragraphs:
-                for word in word_tokenize(para):
-                    if word not in raw_freq_dict:
-                        raw_freq_dict[word] = 1
-                    else:
-                        raw_freq_dict[word] = raw_freq_dict[word] + 1
+        text_tokens = count_tokens(read_lines(f), raw_freq_dict)
+        if token_store is not None:
+            token_store.add(f, text_tokens)
+        else:
+            for tokens in text_tokens: # only count the words
+                pass
     return raw_freq_dict
 
-def combine_dictionaries_in_list(raw_freq_dict_list):
-    combined_dict = {}
-    
-    for el in raw_freq_dict_list:
-        for word, freq in el.items():
-            if word in combined_dict:
-                combined_dict[word] = combined_dict[word] + freq
+# Tokenize the lines, count the words in raw_freq_dict, and yield the tokens for each line
+def count_tokens(lines, raw_freq_dict):
+    for para in lines:
+        tokens = tokenize_words(para)
+        for word in tokens:
+            if word not in raw_freq_dict:
+                raw_freq_dict[word] = 1
             else:
-                combined_dict[word] = freq
-    return combined_dict
+                raw_freq_dict[word] = raw_freq_dict[word] + 1
+        yield tokens
+
+# The folders to gather frequencies from, i.e. the current + freq_dict_window folders on each side
+# (or more on one side, when at the beginning or end of the corpus)
+def get_frequency_window(nr, nr_of_folders, freq_dict_window):
+    start_freq_folder = nr - freq_dict_window
+    end_freq_folder = nr + freq_dict_window + 1
+    
+    if start_freq_folder < 0:
+        start_freq_folder = 0
+        end_freq_folder = start_freq_folder + 2*freq_dict_window + 1
+    if end_freq_folder > nr_of_folders:
+        end_freq_folder = nr_of_folders
+        start_freq_folder = end_freq_folder - (2*freq_dict_window + 1)
+        if start_freq_folder < 0:
+            start_freq_folder = 0
+    return start_freq_folder, end_freq_folder
+
+def add_to_frequency_dictionary(raw_freq_dict, raw_freq_dict_for_folder):
+    for word, freq in raw_freq_dict_for_folder.items():
+        if word in raw_freq_dict:
+            raw_freq_dict[word] = raw_freq_dict[word] + freq
+        else:
+            raw_freq_dict[word] = freq
+
+#############################
+# Compact store for the corpus frequencies
+# The words are interned as integer ids, and the counts for each folder are kept as two NumPy
+# arrays (the ids of the words in the folder and their counts), instead of as one dict per
+# folder. The frequencies for the current window of folders are summed into one count array,
+# which is moved folder by folder, and which is looked up as raw_freq_dict was (word in window,
+# window[word] and window.get(word))
+#############################
+
+class FrequencyStore:
+    def __init__(self):
+        self.word_ids = {}
+        self.folder_word_ids = []
+        self.folder_counts = []
+
+    def get_word_id(self, word):
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.word_ids)
+            self.word_ids[word] = word_id
+        return word_id
+
+    # Add the frequencies for the next folder
+    def add_folder(self, raw_freq_dict_for_folder):
+        np = import_lazily("np")
+        nr_of_words = len(raw_freq_dict_for_folder)
+        self.folder_word_ids.append(np.fromiter([self.get_word_id(word) for word in raw_freq_dict_for_folder], dtype=np.int32, count=nr_of_words))
+        self.folder_counts.append(np.fromiter(raw_freq_dict_for_folder.values(), dtype=np.int32, count=nr_of_words))
+
+    # The number of folders
+    def __len__(self):
+        return len(self.folder_counts)
+
+class FrequencyWindow:
+    def __init__(self, frequency_store):
+        np = import_lazily("np")
+        self.frequency_store = frequency_store
+        self.word_ids = frequency_store.word_ids
+        self.counts = np.zeros(len(self.word_ids), dtype=np.int64)
+
+    # Update the counts from the current frequency window to the new one, by adding the folders
+    # that enter the window and subtracting the ones that leave it (the word ids are unique
+    # within a folder, so the counts can be added with one vectorized operation)
+    def move(self, current_window, new_window):
+        current_start_freq_folder, current_end_freq_folder = current_window
+        start_freq_folder, end_freq_folder = new_window
+        for freq_folder_nr in range(start_freq_folder, end_freq_folder):
+            if not current_start_freq_folder <= freq_folder_nr < current_end_freq_folder:
+                self.counts[self.frequency_store.folder_word_ids[freq_folder_nr]] += self.frequency_store.folder_counts[freq_folder_nr]
+        for freq_folder_nr in range(current_start_freq_folder, current_end_freq_folder):
+            if not start_freq_folder <= freq_folder_nr < end_freq_folder:
+                self.counts[self.frequency_store.folder_word_ids[freq_folder_nr]] -= self.frequency_store.folder_counts[freq_folder_nr]
+
+    # As for a dict, only the words with a frequency in the window are in it
+    def __contains__(self, word):
+        word_id = self.word_ids.get(word)
+        return word_id is not None and self.counts[word_id] > 0
+
+    def __getitem__(self, word):
+        word_id = self.word_ids.get(word)
+        if word_id is None or self.counts[word_id] == 0:
+            raise KeyError(word)
+        return int(self.counts[word_id])
+
+    def get(self, word, default=None):
+        if word in self:
+            return self[word]
+        return default
+
+#############################
+# Background writing of the output
+# With write_in_background=True in compare_folder, the statistics files and the corrected texts
+# are written by a background thread (one in each worker process), so that the correction does
+# not wait for the file system. The text for each file is collected into large chunks, which are
+# put in a bounded queue (so the correction only waits if the writing falls far behind), and
+# the files are written with large buffers. Errors in the writing are raised at the next write.
+#############################
+
+background_writer = None
+write_chunk_size = 65536
+
+class BackgroundWriter:
+    def __init__(self, max_queue_size=256, buffer_size=1048576):
+        self.queue = queue.Queue(max_queue_size)
+        self.buffer_size = buffer_size
+        self.error = None
+        self.pid = os.getpid() # a forked worker process needs its own writer thread
+        self.thread = threading.Thread(target=self.write_queued, daemon=True)
+        self.thread.start()
+
+    def put(self, operation):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(operation)
+
+    # Run in the background thread. After an error, the queue is still emptied, so that put
+    # does not block
+    def write_queued(self):
+        opened_files = {}
+        while True:
+            operation = self.queue.get()
+            if operation is None:
+                break
+            if self.error is not None:
+                continue
+            action, background_file, argument = operation
+            try:
+                if action == "open":
+                    opened_files[background_file] = open(argument, "w", buffering=self.buffer_size)
+                elif action == "write":
+                    opened_files[background_file].write(argument)
+                elif action == "truncate":
+                    opened_files[background_file].truncate(0)
+                elif action == "close":
+                    opened_files.pop(background_file).close()
+            except Exception as e:
+                self.error = e
+        for opened_file in opened_files.values():
+            opened_file.close()
+
+    def finish(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+# Used as a file opened for writing, but written by the background writer
+class BackgroundFile:
+    def __init__(self, writer, file_name):
+        self.writer = writer
+        self.pending = []
+        self.pending_size = 0
+        self.writer.put(("open", self, file_name))
+
+    def write(self, text):
+        self.pending.append(text)
+        self.pending_size = self.pending_size + len(text)
+        if self.pending_size >= write_chunk_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.pending) > 0:
+            self.writer.put(("write", self, "".join(self.pending)))
+            self.pending = []
+            self.pending_size = 0
+
+    # Only for emptying the file
+    def truncate(self, size):
+        self.pending = []
+        self.pending_size = 0
+        self.writer.put(("truncate", self, size))
+
+    def close(self):
+        self.flush()
+        self.writer.put(("close", self, None))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+def start_background_writer():
+    global background_writer
+    if background_writer is None or background_writer.pid != os.getpid():
+        background_writer = BackgroundWriter()
+
+def finish_background_writer():
+    global background_writer
+    if background_writer is not None and background_writer.pid == os.getpid():
+        writer = background_writer
+        background_writer = None
+        writer.finish()
+
+# A writer left by an earlier call to compare_folder, which stopped with an error, is not used again
+def discard_background_writer():
+    global background_writer
+    if background_writer is not None and background_writer.pid == os.getpid():
+        background_writer.queue.put(None)
+    background_writer = None
+
+def open_output_file(file_name):
+    if background_writer is not None and background_writer.pid == os.getpid():
+        return BackgroundFile(background_writer, file_name)
+    return open(file_name, "w")
+
+#############################
+# Correction of one file, either in the main process or in a worker process
+#############################
+
+# The state needed to correct files, set once for each process by init_correction_worker
+correction_worker = {}
+
+def init_correction_worker(known_words, spellchecker, frequency_store, freq_dict_window, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct, correction_cache_size, token_store, correction_tables=None, record_file_lookups=False, profile=False, tokenizer="nltk", max_replacer_variants=0, write_in_background=False):
+    correction_worker.clear()
+    set_tokenizer(tokenizer)
+    set_max_replacer_variants(max_replacer_variants)
+    # A worker process gets its own background writer, which has written everything when the
+    # process exits (in the main process, it is already started by compare_folder)
+    if write_in_background and (background_writer is None or background_writer.pid != os.getpid()):
+        start_background_writer()
+        multiprocessing.util.Finalize(None, finish_background_writer, exitpriority=10)
+    if profile:
+        enable_profiling()
+    correction_worker["known_words"] = known_words
+    correction_worker["spellchecker"] = spellchecker
+    correction_worker["frequency_store"] = frequency_store
+    correction_worker["freq_dict_window"] = freq_dict_window
+    correction_worker["distance"] = distance
+    correction_worker["replacers"] = replacers
+    correction_worker["one_letter_words"] = one_letter_words
+    correction_worker["is_known_compound_function"] = is_known_compound_function
+    correction_worker["min_freq_in_OCRed_corpus_to_replace"] = min_freq_in_OCRed_corpus_to_replace
+    correction_worker["not_to_correct"] = not_to_correct
+    correction_worker["token_store"] = token_store
+    correction_worker["raw_freq_dict"] = FrequencyWindow(frequency_store)
+    correction_worker["freq_window"] = (0, 0)
+    correction_worker["correction_tables"] = correction_tables
+    correction_worker["correction_table"] = None
+    correction_worker["correction_table_folder_nr"] = None
+    correction_worker["record_file_lookups"] = record_file_lookups
+    
+    # correction_cache_size = 0 means no cache (and the cache is not used with correction tables)
+    correction_worker["correction_cache"] = None
+    if correction_cache_size > 0 and correction_tables is None:
+        correction_worker["correction_cache"] = CorrectionCache(correction_cache_size)
+
+# Move the frequency window of the worker to the one for the folder
+def update_worker_frequency_window(folder_nr):
+    freq_window = get_frequency_window(folder_nr, len(correction_worker["frequency_store"]), correction_worker["freq_dict_window"])
+    if freq_window != correction_worker["freq_window"]:
+        correction_worker["raw_freq_dict"].move(correction_worker["freq_window"], freq_window)
+        correction_worker["freq_window"] = freq_window
+        if correction_worker["correction_cache"] is not None:
+            correction_worker["correction_cache"].clear()
+
+def write_output(output_file, text):
+    output_file.write(text)
+
+# The file is read, corrected and written one line at a time, so that the memory used depends
+# on the longest line rather than the size of the file
+def correct_file(file_name, output_for_text_file_name, known_words, not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct, correction_cache=None, text_tokens=None, correction_table=None):
+    not_found_for_text_dict = {}
+    not_found_for_text_after_corrected_dict = {}
+    nr_of_words = 0
+    
+    with open_output_file(output_for_text_file_name) as output_for_text_file:
+        separator = ""
+        for new_sentence, nr_of_words_in_sentence in correct_lines(read_lines(file_name), known_words, not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct, not_found_for_text_dict, not_found_for_text_after_corrected_dict, correction_cache, text_tokens, correction_table):
+            write_output(output_for_text_file, separator + new_sentence)
+            separator = "\n"
+            nr_of_words = nr_of_words + nr_of_words_in_sentence
+            
+        # A text without words gives an empty output file
+        if nr_of_words == 0:
+            output_for_text_file.truncate(0)
+            
+    if nr_of_words == 0:
+        return None, None, 1, 1, 0
+    error_proportion, error_proportion_after_corrected = get_error_proportions(not_found_for_text_dict, not_found_for_text_after_corrected_dict, nr_of_words)
+    return not_found_for_text_dict, not_found_for_text_after_corrected_dict, error_proportion, error_proportion_after_corrected, nr_of_words
+
+# Correct the file in task = (folder_nr, file_name, output_for_text_file_name), and return the
+# statistics for the file, to be merged in the main process
+def correct_file_in_worker(task):
+    folder_nr, file_name, output_for_text_file_name = task
+    update_worker_frequency_window(folder_nr)
+    
+    # Either the correction table for the folder, or the correction cache is used
+    correction_cache = correction_worker["correction_cache"]
+    correction_table = None
+    if correction_worker["correction_tables"] is not None:
+        if correction_worker["correction_table_folder_nr"] != folder_nr:
+            correction_worker["correction_table"] = CorrectionTable(correction_worker["correction_tables"][folder_nr])
+            correction_worker["correction_table_folder_nr"] = folder_nr
+        correction_table = correction_worker["correction_table"]
+    counted = correction_table if correction_table is not None else correction_cache
+    
+    not_found_dict = {}
+    not_found_dict_corrected = {}
+    corrected_dict = {}
+    space_replaced_dict = {}
+    if counted is not None:
+        hits, misses = counted.hits, counted.misses
+    
+    # The lookups made for the file are recorded for the manifest
+    global lookup_recorder
+    if correction_worker["record_file_lookups"]:
+        lookup_recorder = LookupRecorder()
+    
+    file_result = correct_file(file_name, output_for_text_file_name, correction_worker["known_words"], not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict, correction_worker["spellchecker"], correction_worker["raw_freq_dict"], correction_worker["distance"], correction_worker["replacers"], correction_worker["one_letter_words"], correction_worker["is_known_compound_function"], correction_worker["min_freq_in_OCRed_corpus_to_replace"], correction_worker["not_to_correct"], correction_cache, correction_worker["token_store"].get(file_name), correction_table)
+    
+    recorded = lookup_recorder
+    lookup_recorder = None
+    
+    cache_hits_and_misses = (0, 0)
+    if counted is not None:
+        cache_hits_and_misses = (counted.hits - hits, counted.misses - misses)
+    return file_result, (not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict), cache_hits_and_misses, recorded, take_profile()
+
+#############################
+# Correction of the vocabulary, i.e. the unique words in each folder, before the files are
+# corrected. The decisions only depend on the word, the next word class and the frequencies
+# for the folder, so each word only needs to be resolved once per folder.
+#############################
+
+# Tasks (folder_nr, [(word, next_word), ...]) with the unique (word, next word class) pairs in
+# each folder, from the tokens in the token store, split in batches of batch_size
+# The pairs in resolved[folder_nr] (e.g. from the persistent correction cache) are left out
+def get_vocabulary_tasks(tasks, token_store, is_known_compound_function, batch_size=1000, resolved={}):
+    words_per_folder = {}
+    for folder_nr, file_name, output_for_text_file_name in tasks:
+        if folder_nr not in words_per_folder:
+            words_per_folder[folder_nr] = {}
+        words = words_per_folder[folder_nr]
+        resolved_in_folder = resolved.get(folder_nr, {})
+        for tokens in token_store.get(file_name):
+            for word_nr, word in enumerate(tokens):
+                if word_nr >= len(tokens) - 1:
+                    next_word = ""
+                else:
+                    next_word = tokens[word_nr + 1]
+                key = (word, get_next_word_class(next_word, is_known_compound_function))
+                if key not in words and key not in resolved_in_folder:
+                    words[key] = next_word
+                    
+    vocabulary_tasks = []
+    for folder_nr, words in sorted(words_per_folder.items()):
+        words_and_next_words = [(word, next_word) for ((word, next_word_class), next_word) in words.items()]
+        for start in range(0, len(words_and_next_words), batch_size):
+            vocabulary_tasks.append((folder_nr, words_and_next_words[start:start + batch_size]))
+    return vocabulary_tasks
+
+# Resolve the words in task = (folder_nr, [(word, next_word), ...]), with the frequencies for the folder
+def resolve_vocabulary_in_worker(task):
+    folder_nr, words_and_next_words = task
+    update_worker_frequency_window(folder_nr)
+    
+    resolve_args = (correction_worker["known_words"], correction_worker["spellchecker"], correction_worker["raw_freq_dict"], correction_worker["distance"], correction_worker["replacers"], correction_worker["one_letter_words"], correction_worker["is_known_compound_function"], correction_worker["min_freq_in_OCRed_corpus_to_replace"], correction_worker["not_to_correct"])
+    resolved = []
+    for word, next_word in words_and_next_words:
+        if correction_worker["record_file_lookups"]:
+            (is_unknown, new_word), recorded = record_lookups(resolve_word, word, next_word, *resolve_args)
+        else:
+            (is_unknown, new_word), recorded = resolve_word(word, next_word, *resolve_args), None
+        resolved.append(((word, get_next_word_class(next_word, correction_worker["is_known_compound_function"])), (is_unknown, new_word, recorded)))
+    return folder_nr, resolved, take_profile()
+
+# Resolve all vocabulary tasks, in a pool of processes if workers > 1, and return a correction
+# table for each folder
+def get_correction_tables(vocabulary_tasks, init_args, workers, profile_report):
+    correction_tables = {}
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=init_correction_worker, initargs=init_args)
+        vocabulary_results = pool.imap(resolve_vocabulary_in_worker, vocabulary_tasks)
+    else:
+        init_correction_worker(*init_args)
+        vocabulary_results = map(resolve_vocabulary_in_worker, vocabulary_tasks)
+        
+    for folder_nr, resolved, measured in vocabulary_results:
+        add_to_profile(profile_report, measured)
+        if folder_nr not in correction_tables:
+            correction_tables[folder_nr] = {}
+        correction_tables[folder_nr].update(resolved)
+        
+    if pool is not None:
+        pool.close()
+        pool.join()
+    correction_worker.clear()
+    return correction_tables
+    
+##############
+# Manifest for incremental re-runs
+# The manifest stores a hash of each input file and of the files in its frequency window, a hash of
+# the configuration, the statistics for each file, and the words each file looked up (in the known
+# words, in the spell checker and with the compound function). A copy of the known words is kept
+# next to it (manifest_file_name + ".words"). On the next run, only the files whose inputs have
+# changed, or that looked up a word that has been added to or removed from the word lists or
+# not_to_correct, are corrected again. The statistics for the other files are reused.
+##############
+
+manifest_version = 1
+
+def get_file_hash(file_name):
+    file_hash = hashlib.sha256()
+    with open(file_name, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+# Hash of the files in the frequency window of each folder, which the frequencies depend on
+def get_window_hashes(tasks, file_hashes, nr_of_folders, freq_dict_window):
+    files_in_folders = [[] for nr in range(nr_of_folders)]
+    for folder_nr, file_name, output_for_text_file_name in tasks:
+        files_in_folders[folder_nr].append(file_name)
+    window_hashes = []
+    for folder_nr in range(nr_of_folders):
+        start_freq_folder, end_freq_folder = get_frequency_window(folder_nr, nr_of_folders, freq_dict_window)
+        window_hash = hashlib.sha256()
+        for window_folder_nr in range(start_freq_folder, end_freq_folder):
+            for file_name in files_in_folders[window_folder_nr]:
+                window_hash.update((file_name + "\0" + file_hashes[file_name] + "\0").encode("utf-8"))
+        window_hashes.append(window_hash.hexdigest())
+    return window_hashes
+
+# The byte code of a function, with its constants and the names it uses, so that a changed
+# function gives another hash. Sets are sorted, since their order differs between runs
+def get_code_identity(code):
+    constants = []
+    for constant in code.co_consts:
+        if hasattr(constant, "co_code"): # e.g. a nested function or a list comprehension
+            constants.append(get_code_identity(constant))
+        elif isinstance(constant, frozenset):
+            constants.append(sorted([repr(element) for element in constant]))
+        else:
+            constants.append(repr(constant))
+    return [code.co_code.hex(), code.co_names, constants]
+
+# The compound function is identified by its module, its name and its code (but not by the
+# functions it calls, or the globals it uses)
+def get_function_identity(function):
+    code = getattr(function, "__code__", None)
+    return [getattr(function, "__module__", None), getattr(function, "__qualname__", repr(function)), get_code_identity(code) if code is not None else None]
+
+# Hash of the settings that can change the correction of any word. Changes in the word lists and
+# in not_to_correct are instead handled word by word
+def get_config_hash(language, distance, replacers, one_letter_words, freq_dict_window, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, use_symspell, max_replacer_variants):
+    config = [manifest_version, language, distance, replacers, one_letter_words, freq_dict_window, get_function_identity(is_known_compound_function), min_freq_in_OCRed_corpus_to_replace, use_symspell, max_replacer_variants]
+    return hashlib.sha256(repr(config).encode("utf-8")).hexdigest()
+
+# Dictionaries with tuple keys (e.g. corrected_dict) are stored as lists of [key, count]
+def dict_to_items(count_dict):
+    return [[key, count] for (key, count) in count_dict.items()]
+
+def items_to_dict(items):
+    return {(tuple(key) if isinstance(key, list) else key): count for (key, count) in items}
+
+# Returns the manifest from the last run, or None if there is none, or it was made with other settings
+def read_manifest(manifest_file_name, config_hash):
+    if not os.path.exists(manifest_file_name):
+        return None
+    with open(manifest_file_name, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest["config_hash"] != config_hash:
+        print("The settings have changed since the last run, so all files are corrected")
+        return None
+        
+    # The lookups are stored per word, with the numbers of the files that looked them up
+    file_lookups = {file_name: LookupRecorder() for file_name in manifest["file_names"]}
+    recorded_for_nr = [file_lookups[file_name] for file_name in manifest["file_names"]]
+    for word, file_nrs in manifest["looked_up"].items():
+        for file_nr in file_nrs:
+            recorded_for_nr[file_nr].looked_up.add(word)
+    for word, file_nrs in manifest["spellchecked"].items():
+        for file_nr in file_nrs:
+            recorded_for_nr[file_nr].spellchecked.add(word)
+    for word, next_word, is_compound, file_nrs in manifest["compounds"]:
+        for file_nr in file_nrs:
+            recorded_for_nr[file_nr].compounds[(word, next_word)] = is_compound
     
+    for file_name, record in manifest["files"].items():
+        record["lookups"] = file_lookups[file_name]
+        record["counts"] = [items_to_dict(items) for items in record["counts"]]
+    return manifest
+
+def write_manifest(manifest_file_name, config_hash, word_lists_hash, not_to_correct, records):
+    file_names = sorted(records.keys())
+    looked_up = {}
+    spellchecked = {}
+    compounds = {}
+    for file_nr, file_name in enumerate(file_names):
+        recorded = records[file_name]["lookups"]
+        for word in recorded.looked_up:
+            looked_up.setdefault(word, []).append(file_nr)
+        for word in recorded.spellchecked:
+            spellchecked.setdefault(word, []).append(file_nr)
+        for key, is_compound in recorded.compounds.items():
+            compounds.setdefault((key, is_compound), []).append(file_nr)
+            
+    files = {}
+    for file_name, record in records.items():
+        files[file_name] = {"hash": record["hash"], "window_hash": record["window_hash"], "output": record["output"], "result": record["result"], "counts": [dict_to_items(count_dict) for count_dict in record["counts"]]}
+    manifest = {"config_hash": config_hash, "word_lists_hash": word_lists_hash, "not_to_correct": sorted(not_to_correct), "file_names": file_names, "files": files, "looked_up": looked_up, "spellchecked": spellchecked, "compounds": [[word, next_word, is_compound, file_nrs] for (((word, next_word), is_compound), file_nrs) in compounds.items()]}
+    
+    # Write to a temporary file first, to not leave a broken manifest if interrupted
+    with open(manifest_file_name + ".tmp", "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(manifest_file_name + ".tmp", manifest_file_name)
+
+def write_manifest_words(manifest_file_name, known_words):
+    with open(manifest_file_name + ".words", "w", encoding="utf-8") as words_file:
+        for word in sorted(known_words):
+            words_file.write(word + "\n")
+
+# The words added to or removed from the known words or not_to_correct since the last run
+def get_changed_words(manifest, manifest_file_name, known_words, word_lists_hash, not_to_correct):
+    changed_words = set(manifest["not_to_correct"]) ^ set(not_to_correct)
+    if manifest["word_lists_hash"] != word_lists_hash:
+        with open(manifest_file_name + ".words", encoding="utf-8") as words_file:
+            previous_known_words = set([line.rstrip("\n") for line in words_file])
+        changed_words.update(previous_known_words ^ set(known_words))
+    return changed_words
+
+# The files that need to be corrected again: new or changed files (or files in a frequency
+# window with changes), and files that looked up words that have changed
+def get_files_to_correct(manifest, tasks, file_hashes, window_hashes, changed_words, known_words, spellchecker, distance, one_letter_words, is_known_compound_function):
+    # Words given to the spell checker get other candidates if a changed word is within
+    # distance of them, which is the case if they have a delete in common (as in SymSpell)
+    changed_deletes = set()
+    if distance > 0:
+        for word in changed_words:
+            changed_deletes.update(get_deletes(word.lower(), distance))
+    changed_spellchecked = {}
+    changed_compounds = {}
+    
+    files_to_correct = set()
+    for folder_nr, file_name, output_for_text_file_name in tasks:
+        if file_name not in manifest["files"]:
+            files_to_correct.add(file_name)
+            continue
+        record = manifest["files"][file_name]
+        if record["hash"] != file_hashes[file_name] or record["window_hash"] != window_hashes[folder_nr] or record["output"] != output_for_text_file_name or not os.path.exists(output_for_text_file_name):
+            files_to_correct.add(file_name)
+            continue
+        if not changed_words:
+            continue
+            
+        recorded = record["lookups"]
+        if not recorded.looked_up.isdisjoint(changed_words):
+            files_to_correct.add(file_name)
+            continue
+        if changed_deletes:
+            for word in recorded.spellchecked:
+                if word not in changed_spellchecked:
+                    changed_spellchecked[word] = not get_deletes(word.lower(), distance).isdisjoint(changed_deletes)
+                if changed_spellchecked[word]:
+                    files_to_correct.add(file_name)
+                    break
+            if file_name in files_to_correct:
+                continue
+        # The compound function can look up any part of a word, so check if its result has changed
+        for (word, next_word), is_compound in recorded.compounds.items():
+            if (word, next_word, is_compound) not in changed_compounds:
+                changed_compounds[(word, next_word, is_compound)] = is_known_compound_function(word, next_word, known_words, spellchecker, one_letter_words) != is_compound
+            if changed_compounds[(word, next_word, is_compound)]:
+                files_to_correct.add(file_name)
+                break
+    return files_to_correct
+
+##############
+# Persistent correction cache
+# With correction_cache_file in compare_folder, the result of resolve_word for each unique word in
+# each folder is stored in an SQLite database, and looked up instead of resolved again on the next
+# run. The entries for a folder are stored under a hash of everything they depend on: the word
+# lists, not_to_correct, the settings (the same as for the manifest) and the files in the frequency
+# window of the folder. So a changed file only invalidates the entries for the folders that have it
+# in their frequency window, and a change in the word lists or the settings invalidates all entries.
+##############
+
+correction_cache_version = 1
+
+def get_correction_cache_scopes(config_hash, word_lists_hash, not_to_correct, window_hashes):
+    base = repr([correction_cache_version, config_hash, word_lists_hash, sorted(not_to_correct)])
+    return [hashlib.sha256((base + window_hash).encode("utf-8")).hexdigest() for window_hash in window_hashes]
+
+def lookups_to_json(recorded):
+    return json.dumps([sorted(recorded.looked_up), sorted(recorded.spellchecked), [[word, next_word, is_compound] for ((word, next_word), is_compound) in recorded.compounds.items()]])
+
+def json_to_lookups(text):
+    looked_up, spellchecked, compounds = json.loads(text)
+    recorded = LookupRecorder()
+    recorded.looked_up.update(looked_up)
+    recorded.spellchecked.update(spellchecked)
+    for word, next_word, is_compound in compounds:
+        recorded.compounds[(word, next_word)] = is_compound
+    return recorded
+
+class PersistentCorrectionCache:
+    def __init__(self, cache_file_name):
+        self.connection = import_lazily("sqlite3").connect(cache_file_name)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS corrections (scope TEXT, word TEXT, next_word_class TEXT, is_unknown INTEGER, new_word TEXT, lookups TEXT, PRIMARY KEY (scope, word, next_word_class)) WITHOUT ROWID")
+        
+    # The entries {(word, next word class): (is_unknown, new_word, recorded lookups or None)} for
+    # scope, as in a CorrectionTable. With need_lookups (when there is a manifest), the entries
+    # stored without the lookups they made are left out, and resolved again
+    def get_entries(self, scope, need_lookups):
+        entries = {}
+        for word, next_word_class, is_unknown, new_word, lookups in self.connection.execute("SELECT word, next_word_class, is_unknown, new_word, lookups FROM corrections WHERE scope = ?", (scope,)):
+            if need_lookups:
+                if lookups is None:
+                    continue
+                entries[(word, next_word_class)] = (bool(is_unknown), new_word, json_to_lookups(lookups))
+            else:
+                entries[(word, next_word_class)] = (bool(is_unknown), new_word, None)
+        return entries
+        
+    def add_entries(self, scope, entries):
+        rows = []
+        for (word, next_word_class), (is_unknown, new_word, recorded) in entries.items():
+            rows.append((scope, word, next_word_class, is_unknown, new_word, lookups_to_json(recorded) if recorded is not None else None))
+        self.connection.executemany("INSERT OR REPLACE INTO corrections VALUES (?, ?, ?, ?, ?, ?)", rows)
+        
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+##############
+# Statistics database
+# With statistics_database set to a file name in compare_folder, the statistics are also written
+# to an SQLite database: the number of words and the error proportions for each file, the words not
+# found in each file, and the replacements and space replacements made in each file, with their
+# counts. The rows are inserted in large batches in one transaction, and the indexes are created
+# at the end, so that e.g. the files a replacement was made in are found without reading through
+# the statistics files. Several runs (e.g. for different periodicals) can be written to the same
+# database. A run replaces an earlier run with the same periodical and output_filename.
+##############
+
+statistics_database_batch_size = 100000
+
+statistics_database_tables = ["CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY, periodical TEXT, output_filename TEXT, corpus_folder TEXT)",
+    "CREATE TABLE IF NOT EXISTS files (file_id INTEGER PRIMARY KEY, run_id INTEGER, folder TEXT, file_name TEXT, nr_of_words INTEGER, error_proportion REAL, error_proportion_corrected REAL)",
+    "CREATE TABLE IF NOT EXISTS not_found (file_id INTEGER, word TEXT, nr INTEGER, nr_not_corrected INTEGER)",
+    "CREATE TABLE IF NOT EXISTS replacements (file_id INTEGER, old TEXT, new TEXT, nr INTEGER)",
+    "CREATE TABLE IF NOT EXISTS space_replaced (file_id INTEGER, old TEXT, new TEXT, nr INTEGER)"]
+
+statistics_database_indexes = ["CREATE INDEX IF NOT EXISTS files_run_id ON files (run_id)",
+    "CREATE INDEX IF NOT EXISTS not_found_word ON not_found (word)",
+    "CREATE INDEX IF NOT EXISTS not_found_file_id ON not_found (file_id)",
+    "CREATE INDEX IF NOT EXISTS replacements_old_new ON replacements (old, new)",
+    "CREATE INDEX IF NOT EXISTS replacements_new ON replacements (new)",
+    "CREATE INDEX IF NOT EXISTS replacements_file_id ON replacements (file_id)",
+    "CREATE INDEX IF NOT EXISTS space_replaced_old_new ON space_replaced (old, new)",
+    "CREATE INDEX IF NOT EXISTS space_replaced_file_id ON space_replaced (file_id)"]
+
+class StatisticsDatabase:
+    def __init__(self, database_file_name, periodical, output_filename, corpus_folder):
+        self.connection = import_lazily("sqlite3").connect(database_file_name)
+        for statement in statistics_database_tables:
+            self.connection.execute(statement)
+        self.remove_runs(periodical, output_filename)
+        self.run_id = self.connection.execute("INSERT INTO runs (periodical, output_filename, corpus_folder) VALUES (?, ?, ?)", (periodical, output_filename, corpus_folder)).lastrowid
+        self.next_file_id = self.connection.execute("SELECT COALESCE(MAX(file_id), 0) + 1 FROM files").fetchone()[0]
+        self.rows = {"files": [], "not_found": [], "replacements": [], "space_replaced": []}
+        self.nr_of_rows = 0
+        
+    def remove_runs(self, periodical, output_filename):
+        run_ids = [(run_id,) for (run_id,) in self.connection.execute("SELECT run_id FROM runs WHERE periodical = ? AND output_filename = ?", (periodical, output_filename))]
+        for table in ["not_found", "replacements", "space_replaced"]:
+            self.connection.executemany("DELETE FROM " + table + " WHERE file_id IN (SELECT file_id FROM files WHERE run_id = ?)", run_ids)
+        self.connection.executemany("DELETE FROM files WHERE run_id = ?", run_ids)
+        self.connection.executemany("DELETE FROM runs WHERE run_id = ?", run_ids)
+        
+    # not_found_for_text_dict is None for files that seem empty, which get no error proportions
+    def add_file(self, folder, file_name, nr_of_words, error_proportion, error_proportion_after_corrected, not_found_for_text_dict, not_found_for_text_after_corrected_dict, corrected_dict, space_replaced_dict):
+        file_id = self.next_file_id
+        self.next_file_id = self.next_file_id + 1
+        if not_found_for_text_dict is None:
+            self.rows["files"].append((file_id, self.run_id, folder, file_name, nr_of_words, None, None))
+        else:
+            self.rows["files"].append((file_id, self.run_id, folder, file_name, nr_of_words, error_proportion, error_proportion_after_corrected))
+            for word, nr in not_found_for_text_dict.items():
+                self.rows["not_found"].append((file_id, word, nr, not_found_for_text_after_corrected_dict.get(word, 0)))
+        for (old, new), nr in corrected_dict.items():
+            self.rows["replacements"].append((file_id, old, new, nr))
+        for (old, new), nr in space_replaced_dict.items():
+            self.rows["space_replaced"].append((file_id, old, new, nr))
+        self.nr_of_rows = sum([len(rows) for rows in self.rows.values()])
+        if self.nr_of_rows >= statistics_database_batch_size:
+            self.insert_rows()
+            
+    def insert_rows(self):
+        for table, rows in self.rows.items():
+            if rows:
+                self.connection.executemany("INSERT INTO " + table + " VALUES (" + ", ".join(["?"]*len(rows[0])) + ")", rows)
+                rows.clear()
+        self.nr_of_rows = 0
+        
+    def close(self):
+        self.insert_rows()
+        for statement in statistics_database_indexes:
+            self.connection.execute(statement)
+        self.connection.commit()
+        self.connection.close()
+
 ###########################################
 # This is the main external function to run
 ###########################################
 
 
 
-def compare_folder(corpus_folder, terminologies_file_name, output_filename, main_output,  main_output_text, periodical, language, distance=1, replacers=default_replacers, one_letter_words = ["m", "g", "a"], freq_dict_window=10, okay_error_proportion=0.05, only_create_folders=False, is_known_compound_function=is_known_compound, to_exclude_from_terminology = [], min_freq_in_OCRed_corpus_to_replace=2, not_to_correct=[]):
+def compare_folder(corpus_folder, terminologies_file_name, output_filename, main_output,  main_output_text, periodical, language, distance=1, replacers=default_replacers, one_letter_words = ["m", "g", "a"], freq_dict_window=10, okay_error_proportion=0.05, only_create_folders=False, is_known_compound_function=is_known_compound, to_exclude_from_terminology = [], min_freq_in_OCRed_corpus_to_replace=2, not_to_correct=[], correction_cache_size=100000, workers=1, max_tokens_in_memory=10000000, lexicon_file_name=None, use_symspell=False, correct_vocabulary_first=False, manifest_file_name=None, profile=False, tokenizer="nltk", plot=True, max_replacer_variants=0, write_in_background=False, statistics_database=None, correction_cache_file=None, max_not_found_words=None):
+
 
+    # With profile, the time spent in each stage is written to a JSON file in the statistics folder
+    profile_report = {}
+    start_time = time.perf_counter()
+    if profile:
+        enable_profiling()
+        
+    # tokenizer="builtin" gives the same tokens as NLTK's word_tokenize, but faster
+    set_tokenizer(tokenizer)
+    
+    # With max_replacer_variants > 0, the replacers are also applied at one position at a time
+    set_max_replacer_variants(max_replacer_variants)
 
     # Read terminologies
     if not os.path.exists(terminologies_file_name):
         print("The file " + terminologies_file_name + " does not exist")
         exit()
-    known_words = get_known_words(terminologies_file_name, to_exclude_from_terminology)
+    if lexicon_file_name:
+        known_words = open_lexicon(lexicon_file_name, terminologies_file_name, to_exclude_from_terminology)
+    else:
+        known_words = get_known_words(terminologies_file_name, to_exclude_from_terminology)
 
-    # Initialize spellChecker
-    try:
-        spellchecker = SpellChecker(language=language, distance=distance)
-    except ValueError:
-        print("There is no built-in spelling correction for the language " + language + ". The spelling correction will rely entirely on the word lists you provide.")
-        spellchecker = SpellChecker(local_dictionary = "", distance=distance)
-        
-    spellchecker.word_frequency.load_words(list(known_words))
+    spellchecker = get_spellchecker(language, distance, known_words, use_symspell)
 
     # Create folders to store statistcs output
     if not os.path.exists(main_output):
@@ -835,17 +2774,36 @@ def compare_folder(corpus_folder, terminologies_file_name, output_filename, main
     not_found_dict_corrected = {}
     corrected_dict = {}
     space_replaced_dict = {}
+    correction_cache_hits = 0
+    
+    # With max_not_found_words, only the most frequent words not found are kept, with estimated counts
+    if max_not_found_words is not None:
+        if not isinstance(max_not_found_words, int) or max_not_found_words < 1:
+            print("max_not_found_words should be an integer >= 1, not " + str(max_not_found_words))
+            exit()
+        not_found_dict = HeavyHitters(max_not_found_words)
+        not_found_dict_corrected = HeavyHitters(max_not_found_words)
+    correction_cache_misses = 0
     
-    write_to = open(os.path.join(output_folder, output_filename), "w")
+    # With write_in_background, the output is written by a background thread
+    discard_background_writer()
+    if write_in_background:
+        start_background_writer()
+    write_to = open_output_file(os.path.join(output_folder, output_filename))
     output_filename_corrected = "corrected_" + output_filename
     output_filename_replacements = "replacements_made_" + output_filename
     output_filename_space_replaced = "space_replaced_" + output_filename
     output_filename_not_found = "not_found_" + output_filename
         
-    write_to_corrected = open(os.path.join(output_folder, output_filename_corrected), "w")
-    write_to_replacements = open(os.path.join(output_folder, output_filename_replacements), "w")
-    write_to_space_replaced = open(os.path.join(output_folder, output_filename_space_replaced), "w")
-    write_to_not_found = open(os.path.join(output_folder, output_filename_not_found), "w")
+    write_to_corrected = open_output_file(os.path.join(output_folder, output_filename_corrected))
+    write_to_replacements = open_output_file(os.path.join(output_folder, output_filename_replacements))
+    write_to_space_replaced = open_output_file(os.path.join(output_folder, output_filename_space_replaced))
+    write_to_not_found = open_output_file(os.path.join(output_folder, output_filename_not_found))
+    
+    # With statistics_database, the statistics for each file are also written to an SQLite database
+    database = None
+    if statistics_database:
+        database = StatisticsDatabase(statistics_database, periodical, output_filename, corpus_folder)
     
     
     folders = sorted(glob.glob(os.path.join(corpus_folder, "*")))
@@ -858,36 +2816,9 @@ def compare_folder(corpus_folder, terminologies_file_name, output_filename, main
     else:
         print(str(len(folders)) +  " nr of subfolders found in ", corpus_folder)
         
-    # First read through all files ones, to just gather frequency statistics for
-    # unprocessed files
-    raw_freq_dict_list = []
-    for folder in folders:
-        raw_freq_dict_for_folder = get_raw_frequency(folder)
-        raw_freq_dict_list.append(raw_freq_dict_for_folder)
-    
-    
-    freq_dict_window = 5 # = the total numer of folders is the current + 2*FREQ_DIC_WINDOW
+    # All files to correct, in the order the statistics are written
+    tasks = []
     for nr, folder in enumerate(folders):
-    
-        print(folder)
-        
-        start_freq_folder = nr - freq_dict_window
-        end_freq_folder = nr + freq_dict_window + 1
-        
-        if start_freq_folder < 0:
-            start_freq_folder = 0
-            end_freq_folder = start_freq_folder + 2*freq_dict_window + 1
-        if end_freq_folder > len(raw_freq_dict_list):
-            end_freq_folder = len(raw_freq_dict_list)
-            start_freq_folder = end_freq_folder - (2*freq_dict_window + 1)
-            if start_freq_folder < 0:
-                start_freq_folder = 0
-            
-        
-        part_of_freq_dict_list = raw_freq_dict_list[start_freq_folder:end_freq_folder]
-            
-        raw_freq_dict = combine_dictionaries_in_list(raw_freq_dict_list)
-
         basefolder_name = os.path.basename(folder)
         
         # Folder for text output
@@ -897,64 +2828,169 @@ def compare_folder(corpus_folder, terminologies_file_name, output_filename, main
 
         files = sorted(glob.glob(os.path.join(folder, "*.txt")))
         for f in files:
-            file_base_name = os.path.basename(f)
-            file_names.append(file_base_name)
+            output_for_text_file_name = os.path.join(output_text_sub_folder, os.path.basename(f))
+            tasks.append((nr, f, output_for_text_file_name))
             
-            output_for_text_file_name = os.path.join(output_text_sub_folder, file_base_name)
-            output_for_text_file = open(output_for_text_file_name, "w")
-                      
-            write_to.write("\n------" + file_base_name + "------\n")
-            write_to_corrected.write("\n------" + file_base_name + "------\n")
-            with open(f, encoding='utf-8-sig') as opened:
-                content = opened.read()
-                 
-                not_found_for_text_dict, not_found_for_text_after_corrected_dict, error_proportion, error_proportion_after_corrected, nr_of_words, new_text_str = search_not_found(content, known_words, not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict, spellchecker, raw_freq_dict, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct)
-
-                all_nr_of_words.append(nr_of_words)
-                if not_found_for_text_dict == None:
-                    write_to.write("SEEMS EMPTY\n")
-                    write_to_corrected.write("SEEMS EMPTY\n")
-                    error_props.append(-0.05)
-                    error_props_corrected.append(-0.05)
-                    colors.append("black")
-                    colors_corrected.append("black")
+    # With a manifest from an earlier run, only the files that might be corrected differently
+    # are corrected again
+    manifest = None
+    files_to_correct = set([f for (nr, f, output_for_text_file_name) in tasks])
+    if manifest_file_name or correction_cache_file:
+        file_hashes = {f: get_file_hash(f) for (nr, f, output_for_text_file_name) in tasks}
+        window_hashes = get_window_hashes(tasks, file_hashes, len(folders), freq_dict_window)
+        config_hash = get_config_hash(language, distance, replacers, one_letter_words, freq_dict_window, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, use_symspell, max_replacer_variants)
+        word_lists_hash = get_word_lists_hash(terminologies_file_name, to_exclude_from_terminology).hex()
+    if manifest_file_name:
+        manifest = read_manifest(manifest_file_name, config_hash)
+        if manifest is not None:
+            changed_words = get_changed_words(manifest, manifest_file_name, known_words, word_lists_hash, not_to_correct)
+            files_to_correct = get_files_to_correct(manifest, tasks, file_hashes, window_hashes, changed_words, known_words, spellchecker, distance, one_letter_words, is_known_compound_function)
+            print(str(len(changed_words)) + " words changed since the last run. Correcting " + str(len(files_to_correct)) + " of " + str(len(tasks)) + " files")
+    tasks_to_correct = [task for task in tasks if task[1] in files_to_correct]
+    
+    # Only the frequencies for the folders in the frequency windows of the files to correct are needed
+    folders_with_frequencies = set()
+    for nr, f, output_for_text_file_name in tasks_to_correct:
+        start_freq_folder, end_freq_folder = get_frequency_window(nr, len(folders), freq_dict_window)
+        folders_with_frequencies.update(range(start_freq_folder, end_freq_folder))
+        
+    # First read through all files ones, to just gather frequency statistics for
+    # unprocessed files
+    # The tokens are kept, to not have to tokenize again when correcting
+    # The frequencies are kept in a FrequencyStore, and not as one dict per folder
+    frequency_store = FrequencyStore()
+    token_store = TokenStore(max_tokens_in_memory)
+    for nr, folder in enumerate(folders):
+        if nr in folders_with_frequencies:
+            frequency_store.add_folder(get_raw_frequency(folder, token_store))
+        else:
+            frequency_store.add_folder({})
+    add_to_profile(profile_report, take_profile())
+    
+    # With workers > 1, the files are spread over a pool of processes, which each get the
+    # word lists, the spellchecker and the frequencies once. The statistics for each file are
+    # returned in the original order, so the output is the same as when correcting in this process
+    # The lookups made for each file are recorded when there is a manifest
+    record_file_lookups = manifest_file_name is not None
+    worker_args = (known_words, spellchecker, frequency_store, freq_dict_window, distance, replacers, one_letter_words, is_known_compound_function, min_freq_in_OCRed_corpus_to_replace, not_to_correct, correction_cache_size, token_store)
+    init_args = worker_args + (None, record_file_lookups, profile, tokenizer, max_replacer_variants, write_in_background)
+    
+    # With correct_vocabulary_first, all unique words in each folder are first resolved (by the
+    # workers, if workers > 1), and the files are then corrected by looking up the words
+    # With correction_cache_file, the words resolved in an earlier run (with the same inputs) are
+    # taken from the persistent correction cache, and the others are resolved and added to it
+    if correct_vocabulary_first or correction_cache_file:
+        cached_entries = {}
+        if correction_cache_file:
+            persistent_cache = PersistentCorrectionCache(correction_cache_file)
+            cache_scopes = get_correction_cache_scopes(config_hash, word_lists_hash, not_to_correct, window_hashes)
+            for folder_nr in set([task[0] for task in tasks_to_correct]):
+                cached_entries[folder_nr] = persistent_cache.get_entries(cache_scopes[folder_nr], record_file_lookups)
+        vocabulary_tasks = get_vocabulary_tasks(tasks_to_correct, token_store, is_known_compound_function, resolved=cached_entries)
+        print("Resolving " + str(sum([len(words_and_next_words) for (folder_nr, words_and_next_words) in vocabulary_tasks])) + " unique words in " + str(len(folders)) + " folders")
+        if correction_cache_file:
+            print(str(sum([len(entries) for entries in cached_entries.values()])) + " words found in the correction cache")
+        correction_tables = get_correction_tables(vocabulary_tasks, init_args, workers, profile_report)
+        if correction_cache_file:
+            for folder_nr, entries in correction_tables.items():
+                persistent_cache.add_entries(cache_scopes[folder_nr], entries)
+            persistent_cache.close()
+            for folder_nr, entries in cached_entries.items():
+                correction_tables.setdefault(folder_nr, {}).update(entries)
+        init_args = worker_args + (correction_tables, record_file_lookups, profile, tokenizer, max_replacer_variants, write_in_background)
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=init_correction_worker, initargs=init_args)
+        file_results = pool.imap(correct_file_in_worker, tasks_to_correct)
+    else:
+        init_correction_worker(*init_args)
+        file_results = map(correct_file_in_worker, tasks_to_correct)
+    
+    manifest_records = {}
+    last_folder_nr = -1
+    for (folder_nr, f, output_for_text_file_name) in tasks:
+        if folder_nr != last_folder_nr:
+            print(folders[folder_nr])
+            last_folder_nr = folder_nr
+            
+        # Files that are not corrected again get the statistics from the last run
+        if f in files_to_correct:
+            file_result, file_counts, cache_hits_and_misses, recorded, measured = next(file_results)
+            add_to_profile(profile_report, measured)
+        else:
+            record = manifest["files"][f]
+            file_result, file_counts, cache_hits_and_misses, recorded = record["result"], record["counts"], (0, 0), record["lookups"]
+        if manifest_file_name:
+            manifest_records[f] = {"hash": file_hashes[f], "window_hash": window_hashes[folder_nr], "output": output_for_text_file_name, "result": file_result, "counts": file_counts, "lookups": recorded}
+            
+        file_base_name = os.path.basename(f)
+        file_names.append(file_base_name)
+        
+        for count_dict, file_count_dict in zip([not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict], file_counts):
+            add_counts(count_dict, file_count_dict)
+        correction_cache_hits = correction_cache_hits + cache_hits_and_misses[0]
+        correction_cache_misses = correction_cache_misses + cache_hits_and_misses[1]
+                  
+        write_to.write("\n------" + file_base_name + "------\n")
+        write_to_corrected.write("\n------" + file_base_name + "------\n")
+        
+        not_found_for_text_dict, not_found_for_text_after_corrected_dict, error_proportion, error_proportion_after_corrected, nr_of_words = file_result
+
+        all_nr_of_words.append(nr_of_words)
+        if database is not None:
+            database.add_file(os.path.basename(folders[folder_nr]), file_base_name, nr_of_words, error_proportion, error_proportion_after_corrected, not_found_for_text_dict, not_found_for_text_after_corrected_dict, file_counts[2], file_counts[3])
+        if not_found_for_text_dict == None:
+            write_to.write("SEEMS EMPTY\n")
+            write_to_corrected.write("SEEMS EMPTY\n")
+            error_props.append(-0.05)
+            error_props_corrected.append(-0.05)
+            colors.append("black")
+            colors_corrected.append("black")
+        else:
+            write_to.write("\t".join(["Error proportion: ", str(error_proportion), "\n"]))
+            write_to.write("\t".join(["Nr of words: ", str(nr_of_words), "\n"]))
+            
+            write_to_corrected.write("\t".join(["Error proportion: ", str(error_proportion_after_corrected), "\n"]))
+            write_to_corrected.write("\t".join(["Nr of words: ", str(nr_of_words), "\n"]))
+            
+            sorted_not_found = sorted([(nr, word) for (word, nr) in not_found_for_text_dict.items()], reverse=True)
+            for (nr, word) in sorted_not_found:
+                write_to.write(word + "\t" + str(nr) + "\n")
+
+            sorted_not_found_corrected = sorted([(nr, word) for (word, nr) in not_found_for_text_after_corrected_dict.items()], reverse=True)
+            for (nr, word) in sorted_not_found_corrected:
+                write_to_corrected.write(word + "\t" + str(nr) + "\n")
+              
+            
+            error_props.append(error_proportion)
+            error_props_corrected.append(error_proportion_after_corrected)
+            
+            if error_proportion <= okay_error_proportion:
+                colors.append("green")
+            else:
+                if nr_of_words > 100:
+                    colors.append("maroon")
                 else:
-                    write_to.write("\t".join(["Error proportion: ", str(error_proportion), "\n"]))
-                    write_to.write("\t".join(["Nr of words: ", str(nr_of_words), "\n"]))
-                    
-                    write_to_corrected.write("\t".join(["Error proportion: ", str(error_proportion_after_corrected), "\n"]))
-                    write_to_corrected.write("\t".join(["Nr of words: ", str(nr_of_words), "\n"]))
-                    
-                    sorted_not_found = sorted([(nr, word) for (word, nr) in not_found_for_text_dict.items()], reverse=True)
-                    for (nr, word) in sorted_not_found:
-                        write_to.write(word + "\t" + str(nr) + "\n")
-
-                    sorted_not_found_corrected = sorted([(nr, word) for (word, nr) in not_found_for_text_after_corrected_dict.items()], reverse=True)
-                    for (nr, word) in sorted_not_found_corrected:
-                        write_to_corrected.write(word + "\t" + str(nr) + "\n")
-                      
-                    
-                    error_props.append(error_proportion)
-                    error_props_corrected.append(error_proportion_after_corrected)
+                    colors.append("black")
                     
-                    if error_proportion <= okay_error_proportion:
-                        colors.append("green")
-                    else:
-                        if nr_of_words > 100:
-                            colors.append("maroon")
-                        else:
-                            colors.append("black")
-                            
-                    if error_proportion_after_corrected <= okay_error_proportion:
-                        colors_corrected.append("green")
-                    else:
-                        if nr_of_words > 100:
-                            colors_corrected.append("maroon")
-                        else:
-                            colors_corrected.append("black")
-                            
-                output_for_text_file.write(new_text_str)
-            output_for_text_file.close()
+            if error_proportion_after_corrected <= okay_error_proportion:
+                colors_corrected.append("green")
+            else:
+                if nr_of_words > 100:
+                    colors_corrected.append("maroon")
+                else:
+                    colors_corrected.append("black")
+    
+    if pool is not None:
+        pool.close()
+        pool.join()
+    correction_worker.clear()
+    token_store.remove_spilled()
+    
+    if manifest_file_name:
+        if manifest is None or manifest["word_lists_hash"] != word_lists_hash:
+            write_manifest_words(manifest_file_name, known_words)
+        write_manifest(manifest_file_name, config_hash, word_lists_hash, not_to_correct, manifest_records)
             
 
     assert(len(error_props) == len(file_names))
@@ -969,6 +3005,10 @@ def compare_folder(corpus_folder, terminologies_file_name, output_filename, main
     # Write error proportion
     write_error_propotion_to_file(write_to, error_props, file_names, all_nr_of_words, okay_error_proportion)
     write_error_propotion_to_file(write_to_corrected, error_props_corrected, file_names, all_nr_of_words, okay_error_proportion)
+    
+    if correction_cache_size > 0 or correct_vocabulary_first or correction_cache_file:
+        with open_output_file(os.path.join(output_folder, "correction_cache_" + output_filename)) as write_to_correction_cache:
+            write_correction_cache_statistics(write_to_correction_cache, correction_cache_hits, correction_cache_misses, len(files_to_correct), len(file_names), workers)
             
     # Write corrected errors
     last_nr_of_replaced = math.inf
@@ -1002,7 +3042,280 @@ def compare_folder(corpus_folder, terminologies_file_name, output_filename, main
     write_to_replacements.close()
     write_to_space_replaced.close()
     write_to_not_found.close()
+    finish_background_writer()
+    if database is not None:
+        database.close()
+
+    # Plot error (with plot=False, matplotlib is not imported)
+    if plot:
+        plot_output(file_names, error_props, all_nr_of_words, colors, output_folder, output_filename, okay_error_proportion)
+        plot_output(file_names, error_props_corrected, all_nr_of_words, colors, output_folder, output_filename_corrected, okay_error_proportion)
+    
+    if profile:
+        add_to_profile(profile_report, take_profile())
+        disable_profiling()
+        write_profile(output_folder, output_filename, profile_report, time.perf_counter() - start_time, workers)
+
+
+#############################
+# In-memory correction
+# A Corrector corrects texts given as strings, without reading or writing any files (except the
+# word lists, if they are given as a terminologies file). It is built once, with the same settings
+# as compare_folder, and the frequencies to use for the suggestions (raw_freq_dict, e.g. from
+# get_frequencies_for_texts or get_corpus_frequencies). With keep_totals, the statistics for all
+# texts are also added up in not_found_dict, not_found_dict_corrected, corrected_dict and
+# space_replaced_dict, as in compare_folder (and with max_not_found_words, the words not found are
+# counted in a HeavyHitters).
+#############################
+
+indexed_compound_functions = [is_known_compound_swedish_indexed]
 
-    # Plot error
-    plot_output(file_names, error_props, all_nr_of_words, colors, output_folder, output_filename, okay_error_proportion)
-    plot_output(file_names, error_props_corrected, all_nr_of_words, colors, output_folder, output_filename_corrected, okay_error_proportion)
+# The frequencies of the words in texts
+def get_frequencies_for_texts(texts):
+    raw_freq_dict = {}
+    for text in texts:
+        for tokens in count_tokens(get_lines(text), raw_freq_dict): # only count the words
+            pass
+    return raw_freq_dict
+
+# The frequencies in all subfolders of corpus_folder
+def get_corpus_frequencies(corpus_folder):
+    frequency_store = FrequencyStore()
+    for folder in sorted(glob.glob(os.path.join(corpus_folder, "*"))):
+        frequency_store.add_folder(get_raw_frequency(folder))
+    raw_freq_dict = FrequencyWindow(frequency_store)
+    raw_freq_dict.move((0, 0), (0, len(frequency_store)))
+    return raw_freq_dict
+
+class Corrector:
+    # known_words (e.g. a set) can be given instead of terminologies_file_name. The indexes are
+    # built here, and not with get_expansion_index and get_compound_index, so that several
+    # correctors (e.g. an old and a reloaded one in the correction server) can be used in turn
+    def __init__(self, terminologies_file_name, language, distance=1, replacers=default_replacers, one_letter_words=["m", "g", "a"], is_known_compound_function=is_known_compound, to_exclude_from_terminology=[], min_freq_in_OCRed_corpus_to_replace=2, not_to_correct=[], raw_freq_dict=None, correction_cache_size=100000, use_symspell=False, tokenizer="nltk", max_replacer_variants=0, known_words=None, keep_totals=True, max_not_found_words=None):
+        # The settings are only checked here, and set by use, as another corrector can be in use
+        check_tokenizer(tokenizer)
+        check_max_replacer_variants(max_replacer_variants)
+        self.tokenizer = tokenizer
+        self.max_replacer_variants = max_replacer_variants
+        if known_words is None:
+            if not os.path.exists(terminologies_file_name):
+                print("The file " + terminologies_file_name + " does not exist")
+                exit()
+            known_words = get_known_words(terminologies_file_name, to_exclude_from_terminology)
+        self.known_words = known_words
+        self.spellchecker = get_spellchecker(language, distance, known_words, use_symspell)
+        self.raw_freq_dict = raw_freq_dict if raw_freq_dict is not None else {}
+        self.distance = distance
+        self.replacers = replacers
+        self.one_letter_words = one_letter_words
+        self.is_known_compound_function = is_known_compound_function
+        self.min_freq_in_OCRed_corpus_to_replace = min_freq_in_OCRed_corpus_to_replace
+        self.not_to_correct = not_to_correct
+        self.correction_cache = CorrectionCache(correction_cache_size) if correction_cache_size > 0 else None
+        self.expansion_index = ExpansionIndex(known_words)
+        self.compound_index = None
+        if is_known_compound_function in indexed_compound_functions:
+            self.compound_index = CompoundIndex(known_words)
+        self.keep_totals = keep_totals
+        self.not_found_dict = HeavyHitters(max_not_found_words) if max_not_found_words else {}
+        self.not_found_dict_corrected = HeavyHitters(max_not_found_words) if max_not_found_words else {}
+        self.corrected_dict = {}
+        self.space_replaced_dict = {}
+        
+    # Make the settings and indexes for this corrector the ones used by the correction functions
+    def use(self):
+        set_tokenizer(self.tokenizer)
+        set_max_replacer_variants(self.max_replacer_variants)
+        expansion_index["index"] = self.expansion_index
+        expansion_index["known_words"] = self.known_words
+        if self.compound_index is not None:
+            compound_index["index"] = self.compound_index
+            compound_index["known_words"] = self.known_words
+            
+    # Returns the corrected text, and its statistics. A text without words is returned as it is,
+    # with the error proportions None
+    def correct(self, text):
+        self.use()
+        not_found_dict = {}
+        not_found_dict_corrected = {}
+        corrected_dict = {}
+        space_replaced_dict = {}
+        not_found_for_text_dict, not_found_for_text_after_corrected_dict, error_proportion, error_proportion_after_corrected, nr_of_words, new_text_str = search_not_found(text, self.known_words, not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict, self.spellchecker, self.raw_freq_dict, self.distance, self.replacers, self.one_letter_words, self.is_known_compound_function, self.min_freq_in_OCRed_corpus_to_replace, self.not_to_correct, self.correction_cache)
+        if self.keep_totals:
+            for count_dict, text_count_dict in zip([self.not_found_dict, self.not_found_dict_corrected, self.corrected_dict, self.space_replaced_dict], [not_found_dict, not_found_dict_corrected, corrected_dict, space_replaced_dict]):
+                add_counts(count_dict, text_count_dict)
+        if nr_of_words == 0:
+            return text, {"nr_of_words": 0, "error_proportion": None, "error_proportion_after_corrected": None, "not_found": {}, "not_found_after_corrected": {}, "replacements": corrected_dict, "space_replaced": space_replaced_dict}
+        return new_text_str, {"nr_of_words": nr_of_words, "error_proportion": error_proportion, "error_proportion_after_corrected": error_proportion_after_corrected, "not_found": not_found_for_text_dict, "not_found_after_corrected": not_found_for_text_after_corrected_dict, "replacements": corrected_dict, "space_replaced": space_replaced_dict}
+        
+    # Yields the corrected text and its statistics for each text
+    def correct_many(self, texts):
+        for text in texts:
+            yield self.correct(text)
+
+#############################
+# Correction server
+# serve_corrections keeps a Corrector, with the frequencies in a corpus, in memory, and corrects
+# the texts sent to it over HTTP, on a local port or a Unix socket: POST /correct with the text as
+# the body returns the corrected text and its statistics as JSON. POST /reload reads the word
+# lists and the corpus frequencies again in a background thread. The server goes on correcting
+# with the old Corrector until the new one is loaded, and then swaps them.
+#############################
+
+# The statistics from Corrector.correct, with the (old, new) pairs as lists
+def statistics_to_json(new_text, statistics):
+    response = dict(statistics)
+    response["text"] = new_text
+    response["replacements"] = [[old, new, nr] for ((old, new), nr) in statistics["replacements"].items()]
+    response["space_replaced"] = [[old, new, nr] for ((old, new), nr) in statistics["space_replaced"].items()]
+    return response
+
+class CorrectionServer:
+    def __init__(self, corrector_settings, corpus_folder):
+        self.corrector_settings = corrector_settings
+        self.corpus_folder = corpus_folder
+        self.corrector = self.load_corrector()
+        self.lock = threading.Lock() # one text is corrected at a time, and the state is swapped between texts
+        self.reload_thread = None
+        self.nr_of_reloads = 0
+        self.reload_error = None
+        
+    # The frequencies are those in all subfolders of corpus_folder, or none if it is None
+    def load_corrector(self):
+        raw_freq_dict = get_corpus_frequencies(self.corpus_folder) if self.corpus_folder else None
+        return Corrector(raw_freq_dict=raw_freq_dict, keep_totals=False, **self.corrector_settings)
+        
+    def correct(self, text):
+        with self.lock:
+            return statistics_to_json(*self.corrector.correct(text))
+            
+    # Returns False if a reload is already running
+    def reload_in_background(self):
+        if self.reload_thread is not None and self.reload_thread.is_alive():
+            return False
+        self.reload_thread = threading.Thread(target=self.reload, daemon=True)
+        self.reload_thread.start()
+        return True
+        
+    # If the word lists can not be read (get_known_words exits), the old state is kept
+    def reload(self):
+        try:
+            corrector = self.load_corrector()
+        except (Exception, SystemExit) as e:
+            self.reload_error = repr(e)
+            print("Reload failed: " + self.reload_error)
+            return
+        with self.lock:
+            self.corrector = corrector
+            self.nr_of_reloads = self.nr_of_reloads + 1
+            self.reload_error = None
+        print("Reloaded the word lists and the frequencies")
+        
+    def get_status(self):
+        return {"nr_of_words_in_word_lists": len(self.corrector.known_words), "nr_of_reloads": self.nr_of_reloads, "reloading": self.reload_thread is not None and self.reload_thread.is_alive(), "reload_error": self.reload_error}
+
+# The methods of the request handler. The handler class itself, with BaseHTTPRequestHandler, is
+# created by get_server_classes, so that http.server is only imported when serving
+class CorrectionRequestHandling:
+    # A text that is not UTF-8, or a missing or invalid Content-Length, gives 400 (or 411), and an
+    # error when correcting gives 500, without stopping the server
+    def do_POST(self):
+        if self.path == "/correct":
+            if "Content-Length" not in self.headers:
+                self.send_error(411, "Content-Length is needed")
+                return
+            try:
+                content_length = int(self.headers["Content-Length"])
+            except ValueError:
+                content_length = -1
+            if content_length < 0:
+                self.send_error(400, "Invalid Content-Length")
+                return
+            try:
+                text = self.rfile.read(content_length).decode("utf-8")
+            except UnicodeDecodeError:
+                self.send_error(400, "The text is not UTF-8")
+                return
+            try:
+                response = self.server.correction_server.correct(text)
+            except Exception as e:
+                print("Correction failed: " + repr(e))
+                self.send_error(500)
+                return
+            self.send_json(response)
+        elif self.path == "/reload":
+            self.send_json({"reloading": self.server.correction_server.reload_in_background()})
+        else:
+            self.send_error(404)
+            
+    def do_GET(self):
+        if self.path == "/status":
+            self.send_json(self.server.correction_server.get_status())
+        else:
+            self.send_error(404)
+            
+    def send_json(self, response):
+        body = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        
+    # Don't print each request
+    def log_message(self, format, *args):
+        pass
+
+# The methods of the HTTP server on a Unix socket, which is created by get_server_classes
+class UnixSocketServing:
+    def server_bind(self):
+        import_lazily("socketserver").TCPServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+        
+    # The client address for a Unix socket is "", and not (host, port)
+    def get_request(self):
+        request, client_address = self.socket.accept()
+        return request, ("unix", 0)
+
+server_classes = {"handler": None, "unix_server": None}
+
+# The request handler and the server for a Unix socket, created the first time they are needed
+def get_server_classes():
+    if server_classes["handler"] is None:
+        base_classes = import_lazily("http_server")
+        server_classes["handler"] = type("CorrectionRequestHandler", (CorrectionRequestHandling, base_classes.BaseHTTPRequestHandler), {})
+        server_classes["unix_server"] = type("UnixHTTPServer", (UnixSocketServing, base_classes.ThreadingHTTPServer), {"address_family": import_lazily("socket").AF_UNIX})
+    return server_classes["handler"], server_classes["unix_server"]
+
+# Keeps serving until interrupted. With socket_file_name, the server listens on a Unix socket, and
+# otherwise on host:port
+def serve_corrections(terminologies_file_name, language, distance=1, replacers=default_replacers, one_letter_words=["m", "g", "a"], is_known_compound_function=is_known_compound, to_exclude_from_terminology=[], min_freq_in_OCRed_corpus_to_replace=2, not_to_correct=[], corpus_folder=None, correction_cache_size=100000, use_symspell=False, tokenizer="nltk", max_replacer_variants=0, socket_file_name=None, host="127.0.0.1", port=8642):
+    if not os.path.exists(terminologies_file_name):
+        print("The file " + terminologies_file_name + " does not exist")
+        exit()
+    corrector_settings = {"terminologies_file_name": terminologies_file_name, "language": language, "distance": distance, "replacers": replacers, "one_letter_words": one_letter_words, "is_known_compound_function": is_known_compound_function, "to_exclude_from_terminology": to_exclude_from_terminology, "min_freq_in_OCRed_corpus_to_replace": min_freq_in_OCRed_corpus_to_replace, "not_to_correct": not_to_correct, "correction_cache_size": correction_cache_size, "use_symspell": use_symspell, "tokenizer": tokenizer, "max_replacer_variants": max_replacer_variants}
+    correction_server = CorrectionServer(corrector_settings, corpus_folder)
+    
+    # Import the tokenizer and the detokenizer before the first text, so that it is also fast
+    correction_server.correct("")
+    import_lazily("TreebankWordDetokenizer")
+    
+    CorrectionRequestHandler, UnixHTTPServer = get_server_classes()
+    if socket_file_name:
+        if os.path.exists(socket_file_name):
+            os.remove(socket_file_name)
+        server = UnixHTTPServer(socket_file_name, CorrectionRequestHandler)
+        print("Serving corrections on the Unix socket " + socket_file_name)
+    else:
+        server = import_lazily("http_server").ThreadingHTTPServer((host, port), CorrectionRequestHandler)
+        print("Serving corrections on http://" + host + ":" + str(server.server_port))
+    server.correction_server = correction_server
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_file_name and os.path.exists(socket_file_name):
+            os.remove(socket_file_name)
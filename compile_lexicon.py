@@ -0,0 +1,15 @@
+import sys
+import compare_to_word_lists
+
+# Compiles the word lists given in a terminologies file (e.g. demo-word-lists.txt) to a lexicon file,
+# which can then be given as lexicon_file_name to compare_folder.
+#
+# Usage: python compile_lexicon.py demo-word-lists.txt demo-word-lists.lex
+
+def run():
+    if len(sys.argv) != 3:
+        print("Usage: python compile_lexicon.py <terminologies file> <lexicon file>")
+        exit()
+    compare_to_word_lists.compile_lexicon(terminologies_file_name=sys.argv[1], lexicon_file_name=sys.argv[2])
+
+run()
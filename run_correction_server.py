@@ -0,0 +1,26 @@
+import sys
+import compare_to_word_lists
+
+# Starts a correction server for the demo word lists, with the frequencies in nonsense-texts.
+# Texts are corrected with e.g.:
+#
+# curl --data-binary @nonsense-texts/1/text1.txt http://127.0.0.1:8642/correct
+#
+# Usage: python run_correction_server.py [<Unix socket file>]
+
+def run():
+    replaces = [("b", "h"), ("à", "å"), ("the", "tbc"), ("a", "å"), ("a", "ä"), ("o", "ö"), ("m", "rn"), ("li", "h"), ("A", "Å"), ("I", "J"), ("ma", "rna"), ("mw", "rne"), ("Il", "H"), ("h", "n"), ("aa", "å"), ("ö", "o"), ("O", "Ö"), ("h", "b"), ("c", "e"), ("S", "å")]
+
+    compare_to_word_lists.serve_corrections(terminologies_file_name="demo-word-lists.txt",
+     language="sv",
+     distance=1,
+     replacers=replaces,
+     one_letter_words = ["m", "g", "a", "i", "å", "ä", "ö"],
+     is_known_compound_function = compare_to_word_lists.is_known_compound_swedish,
+     to_exclude_from_terminology = [],
+     min_freq_in_OCRed_corpus_to_replace=2,
+     not_to_correct=[],
+     corpus_folder="nonsense-texts",
+     socket_file_name=sys.argv[1] if len(sys.argv) > 1 else None)
+
+run()
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+import compare_to_word_lists
+
+
+def write_lines(opened_file, nr_of_lines):
+    for nr in range(nr_of_lines):
+        opened_file.write("Rad " + str(nr) + "\tmed ett ord\n")
+
+
+@pytest.mark.parametrize("nr_of_lines", [0, 1, 10000])
+def test_same_file_as_written_directly(tmp_path, nr_of_lines):
+    with open(str(tmp_path / "direct.txt"), "w") as direct_file:
+        write_lines(direct_file, nr_of_lines)
+    writer = compare_to_word_lists.BackgroundWriter(max_queue_size=2)
+    with compare_to_word_lists.BackgroundFile(writer, str(tmp_path / "background.txt")) as background_file:
+        write_lines(background_file, nr_of_lines)
+    writer.finish()
+    with open(str(tmp_path / "direct.txt")) as direct_file, open(str(tmp_path / "background.txt")) as background_file:
+        assert background_file.read() == direct_file.read()
+
+
+# As for a text without words in correct_file
+def test_truncate_empties_the_file(tmp_path):
+    writer = compare_to_word_lists.BackgroundWriter()
+    with compare_to_word_lists.BackgroundFile(writer, str(tmp_path / "background.txt")) as background_file:
+        write_lines(background_file, 10000)
+        background_file.truncate(0)
+    writer.finish()
+    assert os.path.getsize(str(tmp_path / "background.txt")) == 0
+
+
+def test_error_is_raised_by_finish(tmp_path):
+    writer = compare_to_word_lists.BackgroundWriter()
+    with compare_to_word_lists.BackgroundFile(writer, str(tmp_path / "missing" / "background.txt")) as background_file:
+        write_lines(background_file, 10)
+    with pytest.raises(FileNotFoundError):
+        writer.finish()
+
+
+@pytest.mark.parametrize("write_in_background", [False, True])
+def test_error_is_raised_by_compare_folder(tmp_path, write_in_background):
+    corpus_folder = tmp_path / "corpus"
+    os.makedirs(str(corpus_folder / "texts"))
+    with open(str(corpus_folder / "texts" / "text.txt"), "w") as text_file:
+        text_file.write("Det är en text\n")
+    main_output = tmp_path / "statistics"
+    os.mkdir(str(main_output))
+    # A folder where the statistics file should be written
+    os.makedirs(str(main_output / "texts" / "statistics.txt"))
+    with pytest.raises(IsADirectoryError):
+        compare_to_word_lists.compare_folder(corpus_folder=str(corpus_folder), terminologies_file_name=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "demo-word-lists.txt"), output_filename="statistics.txt", main_output=str(main_output), main_output_text=str(tmp_path / "text"), periodical="texts", language="sv", tokenizer="builtin", plot=False, write_in_background=write_in_background)
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+import compare_to_word_lists
+
+known_words = set(["kyrka", "nattåg", "tåg", "natt", "sanatorie", "läkare", "binde", "medel", "arbete", "hus", "vårdare", "kvinnor", "landet", "personer", "stort", "gård", "bok", "skola", "bil", "väg", "stall", "lyktor"])
+
+# Compounds for each of the rules in is_known_compound_swedish, and words that are not compounds
+swedish_words = [
+ "arbetehus", "arbetelandet", # two known parts
+ "läkarlandet", "kyrkalandet", # a or e left out at the end of the first part
+ "bindsmedel", "landetsmedel", "landet-medel", "landetemedel", # s, - and e between the parts
+ "kyrkolandet", "kyrkelandet", # o or e instead of a
+ "sanatoriumlandet", # ium instead of ie
+ "stallyktor", "nattågarbete", # a doubled consonant written once
+ "kvinnorlandet", "personerstort", "läkarelandet", "vårdarehus",
+ "bokhus", "bilväg", "skolgård", "kyrklandet", "nattlandet", "sanatorielandet", "landetxmedel", "xxxxxxxxxx", "landet", "arbeteslandet"]
+
+
+@pytest.mark.parametrize("word", swedish_words)
+def test_swedish_indexed_gives_same_result(word):
+    assert compare_to_word_lists.is_known_compound_swedish_indexed(word, "", known_words, None, []) == compare_to_word_lists.is_known_compound_swedish(word, "", known_words, None, [])
+
+
+def test_swedish_indexed_finds_linked_compounds():
+    for word in ["läkarlandet", "landetsmedel", "landet-medel", "landetemedel", "kyrkolandet", "kyrkelandet", "sanatoriumlandet", "stallyktor"]:
+        assert compare_to_word_lists.is_known_compound_swedish_indexed(word, "", known_words, None, [])
+
+
+def test_swedish_indexed_gives_same_result_for_random_words():
+    random.seed(0)
+    letters = "aesotiumnkl-åäbd"
+    random_known_words = set(["".join([random.choice(letters) for i in range(random.randint(1, 8))]) for j in range(3000)])
+    random_known_words_list = sorted(random_known_words)
+    for nr in range(20000):
+        if nr % 2 == 0:
+            word = random.choice(random_known_words_list) + random.choice(["", "s", "e", "-", "a"]) + random.choice(random_known_words_list)
+        else:
+            word = "".join([random.choice(letters) for i in range(random.randint(5, 18))])
+        assert compare_to_word_lists.is_known_compound_swedish_indexed(word, "", random_known_words, None, []) == compare_to_word_lists.is_known_compound_swedish(word, "", random_known_words, None, []), word
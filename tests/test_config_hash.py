@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+import compare_to_word_lists
+
+repo_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_config_hash(is_known_compound_function):
+    return compare_to_word_lists.get_config_hash("sv", 1, [("a", "å")], ["a"], 3, is_known_compound_function, 2, False, 0)
+
+
+def is_known_compound_of_my_own(word, next_word, known_words, spellchecker, one_letter_words):
+    return len(word) > 7 and word[:4] in known_words and word[4:] in known_words
+
+
+def test_changed_compound_function_changes_hash():
+    first_hash = get_config_hash(is_known_compound_of_my_own)
+    def is_known_compound_changed(word, next_word, known_words, spellchecker, one_letter_words):
+        return len(word) > 8 and word[:4] in known_words and word[4:] in known_words
+    is_known_compound_changed.__qualname__ = is_known_compound_of_my_own.__qualname__
+    assert get_config_hash(is_known_compound_changed) != first_hash
+    assert get_config_hash(is_known_compound_of_my_own) == first_hash
+    assert get_config_hash(compare_to_word_lists.is_known_compound_swedish) != get_config_hash(compare_to_word_lists.is_known_compound_swedish_indexed)
+
+
+def test_hash_is_the_same_in_another_run():
+    # The order of a set in the code of the compound function must not make the hash differ between runs
+    code = "\n".join(["import compare_to_word_lists as c", "def is_known_compound_with_set(word, next_word, known_words, spellchecker, one_letter_words):", "    return word[-1] in {'s', '-', 'e', 'o', 'a'} and word[:-1] in known_words", "print(c.get_config_hash('sv', 1, [('a', 'å')], ['a'], 3, is_known_compound_with_set, 2, False, 0))"])
+    hashes = set()
+    for seed in ["1", "2"]:
+        output = subprocess.run([sys.executable, "-c", code], cwd=repo_folder, env=dict(os.environ, PYTHONHASHSEED=seed), capture_output=True, text=True, check=True).stdout
+        hashes.add(output.strip())
+    assert len(hashes) == 1
@@ -0,0 +1,37 @@
+import pytest
+
+import compare_to_word_lists
+
+known_words = set(["landet", "medel", "hus", "arbete", "dag", "stort", "sjukhus", "kyrka", "bibl.", "tidn."])
+raw_freq_dict = {"landet": 10, "hus": 5, "dag": 8, "stort": 4, "arbete": 3, "bibl.": 3, "tidn.": 2}
+words = ["landct", "bibl", "tidn", "hns", "dag.", "stort-", "Landet", "arbetehus", "sjuk", "bibl-tidn", "medelhus"]
+next_words = [".", "-", " .", "", "hus", "landet", "bibl"] # all next word classes, and other words
+
+
+# A compound splitter of one's own, that uses next_word
+def is_known_compound_before_hus(word, next_word, known_words, spellchecker, one_letter_words):
+    return next_word == "hus" and len(word) > 6
+
+
+@pytest.fixture(scope="module")
+def spellchecker():
+    return compare_to_word_lists.get_spellchecker("sv", 1, known_words)
+
+
+@pytest.mark.parametrize("is_known_compound_function", [compare_to_word_lists.is_known_compound_swedish, is_known_compound_before_hus])
+def test_cached_result_is_the_same_as_uncached(spellchecker, is_known_compound_function):
+    args = (known_words, spellchecker, raw_freq_dict, 1, compare_to_word_lists.default_replacers, ["a"], is_known_compound_function, 2)
+    correction_cache = compare_to_word_lists.CorrectionCache(1000)
+    # The second time, all words are taken from the cache
+    for nr in range(2):
+        for word in words:
+            for next_word in next_words:
+                uncached = compare_to_word_lists.get_new_word(word, next_word, *args)
+                assert correction_cache.get_new_word(word, next_word, *args) == uncached, (word, next_word)
+    assert correction_cache.hits >= len(words) * len(next_words)
+
+
+def test_next_word_is_kept_for_other_compound_functions():
+    assert compare_to_word_lists.get_next_word_class("hus", compare_to_word_lists.is_known_compound_swedish) == ""
+    assert compare_to_word_lists.get_next_word_class(" .", compare_to_word_lists.is_known_compound) == " ."
+    assert compare_to_word_lists.get_next_word_class("hus", is_known_compound_before_hus) == "hus"
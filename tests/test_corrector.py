@@ -0,0 +1,43 @@
+import glob
+import os
+
+import compare_to_word_lists
+from test_statistics_database import read_replacements
+from test_workers import one_letter_words, replaces, repo_folder, run_compare_folder
+
+
+def get_corrector(**kwargs):
+    # With freq_dict_window=3 in compare_folder, the frequencies for each folder are those in the whole
+    # corpus. They are counted with the tokenizer in use
+    compare_to_word_lists.set_tokenizer("builtin")
+    raw_freq_dict = compare_to_word_lists.get_corpus_frequencies(os.path.join(repo_folder, "nonsense-texts"))
+    return compare_to_word_lists.Corrector(os.path.join(repo_folder, "demo-word-lists.txt"), "sv", replacers=replaces, one_letter_words=one_letter_words, is_known_compound_function=compare_to_word_lists.is_known_compound_swedish, tokenizer="builtin", raw_freq_dict=raw_freq_dict, **kwargs)
+
+
+def test_same_corrections_as_compare_folder(tmp_path):
+    run_compare_folder(str(tmp_path / "output"))
+    corrector = get_corrector()
+    for file_name in sorted(glob.glob(os.path.join(repo_folder, "nonsense-texts", "*", "*.txt"))):
+        with open(file_name) as read_from:
+            new_text, statistics = corrector.correct(read_from.read())
+        folder = os.path.basename(os.path.dirname(file_name))
+        with open(os.path.join(str(tmp_path / "output"), "text", "nonsense", folder, os.path.basename(file_name))) as read_from:
+            assert new_text == read_from.read()
+        assert statistics["nr_of_words"] > 0
+        assert statistics["error_proportion_after_corrected"] <= statistics["error_proportion"]
+    assert corrector.corrected_dict == read_replacements(os.path.join(str(tmp_path / "output"), "statistics", "nonsense", "replacements_made_nonsense-statistics.txt"))
+
+
+def test_correct_many_and_texts_without_words():
+    corrector = get_corrector(keep_totals=False)
+    texts = ["Det var trols allt slort", "", " \n ", "Det var trols allt slort"]
+    results = list(corrector.correct_many(texts))
+    assert results[0] == results[3]
+    assert results[0][0] != texts[0]
+    for text, (new_text, statistics) in zip(texts[1:3], results[1:3]):
+        assert new_text == text
+        assert statistics["nr_of_words"] == 0
+        assert statistics["error_proportion"] is None
+    # Without keep_totals, only the statistics for each text are kept
+    assert corrector.corrected_dict == {}
+    assert corrector.not_found_dict == {}
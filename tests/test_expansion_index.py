@@ -0,0 +1,43 @@
+import random
+
+import compare_to_word_lists
+
+
+# The loop over all letters, with is_known for each expansion, that get_all_expands_with_one_letter had before
+def get_all_expands_with_loop(word, known_words, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function):
+    all_expand_suggestions = []
+    if len(word) <= 3 or "-" in word:
+        return all_expand_suggestions
+    for l in compare_to_word_lists.letters:
+        for suggestion in [word + l, l + word]:
+            if compare_to_word_lists.is_known(suggestion, "", known_words, None, one_letter_words, is_known_compound_function) and compare_to_word_lists.is_suggestion_frequent_enough(raw_freq, raw_freq_dict, suggestion):
+                all_expand_suggestions.append(suggestion)
+    return all_expand_suggestions
+
+
+def get_random_word(letters, min_length, max_length):
+    return "".join([random.choice(letters) for i in range(random.randint(min_length, max_length))])
+
+
+def test_same_expansions_as_the_loop_with_is_known():
+    random.seed(0)
+    letters = "aesotiumnklåAS"
+    known_words = set([get_random_word(letters, 3, 8) for j in range(3000)] + ["kyrka", "Kyrka", "kyrka.", "landet", "Landet"])
+    words = [known_word[1:] for known_word in sorted(known_words)[:300]] + [known_word[:-1] for known_word in sorted(known_words)[300:600]]
+    words = words + [get_random_word(letters + ".19/-", 4, 9) for j in range(500)] + ["yrka", "yrka.", "kyrk", "KYRK", "andet", "ANDET", "Σσσσ"]
+    one_letter_words = ["a", "i"]
+    for is_known_compound_function in [compare_to_word_lists.is_known_compound, compare_to_word_lists.is_known_compound_swedish]:
+        for word in words:
+            raw_freq_dict = {}
+            for l in compare_to_word_lists.letters:
+                raw_freq_dict[word + l] = random.randint(0, 3)
+                raw_freq_dict[l + word] = random.randint(0, 3)
+            raw_freq = 1
+            assert compare_to_word_lists.get_all_expands_with_one_letter(word, known_words, None, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function) == get_all_expands_with_loop(word, known_words, raw_freq_dict, raw_freq, one_letter_words, is_known_compound_function)
+
+
+def test_index_holds_the_removed_letters():
+    index = compare_to_word_lists.ExpansionIndex(["kyrka", "kyrkan", "byrka", "a"])
+    assert sorted(index.first_letters["yrka"]) == ["b", "k"]
+    assert index.last_letters["kyrka"] == "n"
+    assert "" not in index.first_letters
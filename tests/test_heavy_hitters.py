@@ -0,0 +1,63 @@
+import io
+import random
+
+import compare_to_word_lists
+
+
+def get_counts(nr_of_words, seed):
+    random.seed(seed)
+    # About Zipf distributed, as the words not found in a corpus
+    return dict([("ord" + str(nr), int(1000/nr) + random.randint(0, 2)) for nr in range(1, nr_of_words + 1)])
+
+
+# The counts added in batches of random size, as for the files in compare_folder
+def add_in_batches(heavy_hitters, counts):
+    words = list(counts.keys())
+    random.shuffle(words)
+    while words:
+        batch_size = random.randint(1, 50)
+        heavy_hitters.add_counts(dict([(word, counts[word]) for word in words[:batch_size]]))
+        words = words[batch_size:]
+
+
+def test_estimates_are_never_too_low():
+    counts = get_counts(3000, 0)
+    # A narrow sketch, so that many words share counters
+    heavy_hitters = compare_to_word_lists.HeavyHitters(len(counts), width=512)
+    add_in_batches(heavy_hitters, counts)
+    estimates = dict(heavy_hitters.items())
+    assert set(estimates.keys()) == set(counts.keys())
+    assert all([estimates[word] >= nr for (word, nr) in counts.items()])
+    assert any([estimates[word] > nr for (word, nr) in counts.items()])
+
+
+def test_keeps_the_most_frequent_words():
+    counts = get_counts(20000, 1)
+    heavy_hitters = compare_to_word_lists.HeavyHitters(20)
+    add_in_batches(heavy_hitters, counts)
+    most_frequent = sorted(counts.keys(), key=lambda word: -counts[word])[:20]
+    assert dict(heavy_hitters.items()) == dict([(word, counts[word]) for word in most_frequent])
+
+
+def test_nr_of_unique():
+    for nr_of_words in [10, 1000, 100000]:
+        heavy_hitters = compare_to_word_lists.HeavyHitters(10)
+        heavy_hitters.add_counts(dict([("ord" + str(nr), 1) for nr in range(nr_of_words)]))
+        # The same words again do not change the estimate
+        heavy_hitters.add("ord0", 5)
+        assert abs(heavy_hitters.get_nr_of_unique() - nr_of_words) <= 0.03*nr_of_words
+
+
+def test_same_not_found_statistics_as_with_a_dict_when_all_words_are_kept():
+    counts = get_counts(5000, 2)
+    not_found_dict = {}
+    heavy_hitters = compare_to_word_lists.HeavyHitters(len(counts))
+    add_in_batches(heavy_hitters, counts)
+    compare_to_word_lists.add_counts(not_found_dict, counts)
+    written = []
+    for count_dict in [not_found_dict, heavy_hitters]:
+        write_to = io.StringIO()
+        compare_to_word_lists.write_frequencty_of_not_found(write_to, count_dict)
+        # Without the headers, which say if the counts are estimated
+        written.append(write_to.getvalue().split("\n")[3:])
+    assert written[0] == written[1]
@@ -0,0 +1,31 @@
+import random
+
+import benchmark
+import compare_to_word_lists
+
+# The characters the tables remove or compare with, and some others, such as digits that are not ASCII
+characters = ".,!?:();„\"'“‘»«}{*”[]•’= -1_—°g/^Nr.zBuaåé0²٣"
+
+
+def get_random_words(nr_of_words):
+    random.seed(0)
+    words = ["".join([random.choice(characters) for i in range(random.randint(0, 8))]) for j in range(nr_of_words)]
+    return words + ["z. B.", "u. a.", "Nr.5", "5g", "12.30", "—•", "—•—•", "''''", "/////"] + [divider*nr for divider in compare_to_word_lists.dividers for nr in range(1, 6)]
+
+
+def test_same_normalization_as_the_replace_chains():
+    for word in get_random_words(20000):
+        assert benchmark.normalize(word) == benchmark.chained_normalize(word)
+
+
+def test_same_as_the_replace_chains_in_get_new_word_and_for_spaced_words():
+    for word in get_random_words(20000):
+        assert word.translate(compare_to_word_lists.hyphen_and_one_table) == word.replace("-", "").replace("1", "")
+        assert word.translate(compare_to_word_lists.hyphen_and_dot_table) == word.replace("-", "").replace(".", "")
+        assert word.translate(compare_to_word_lists.underscore_and_hyphen_table) == word.replace("_", "").replace("-", "")
+
+
+# The dividers are tried in the same order as before, without the duplicates
+def test_unique_dividers():
+    dividers = compare_to_word_lists.dividers
+    assert compare_to_word_lists.unique_dividers == [divider for (nr, divider) in enumerate(dividers) if divider not in dividers[:nr]]
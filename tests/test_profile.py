@@ -0,0 +1,31 @@
+import compare_to_word_lists
+
+
+def test_timed_counts_calls_and_times_recursive_calls_once():
+    profiler = compare_to_word_lists.Profiler()
+
+    def count_down(nr):
+        return 0 if nr == 0 else timed_count_down(nr - 1)
+
+    timed_count_down = profiler.timed("count down", count_down)
+    assert timed_count_down(5) == 0
+    measured = profiler.take()
+    assert measured["calls"] == {"count down": 6}
+    assert list(measured["seconds"].keys()) == ["count down"]
+    # take starts the measuring over
+    assert profiler.take() == {"seconds": {}, "calls": {}, "is_known_branches": {}}
+
+
+def test_disable_profiling_restores_the_functions():
+    original_functions = [getattr(compare_to_word_lists, function_name) for (stage, function_name) in compare_to_word_lists.profiled_functions]
+    compare_to_word_lists.enable_profiling()
+    try:
+        assert compare_to_word_lists.is_known is not original_functions[3]
+        # Enabling it again does not time the timed functions
+        compare_to_word_lists.enable_profiling()
+        compare_to_word_lists.is_known("xyz", "", set(), None, [], compare_to_word_lists.is_known_compound)
+        assert compare_to_word_lists.take_profile()["calls"]["is_known"] == 1
+    finally:
+        compare_to_word_lists.disable_profiling()
+    assert [getattr(compare_to_word_lists, function_name) for (stage, function_name) in compare_to_word_lists.profiled_functions] == original_functions
+    assert compare_to_word_lists.take_profile() is None
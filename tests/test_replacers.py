@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+import compare_to_word_lists
+
+test_replacers = [("b", "h"), ("à", "å"), ("the", "tbc"), ("a", "å"), ("a", "ä"), ("o", "ö"), ("m", "rn"), ("li", "h"), ("A", "Å"), ("I", "J"), ("ma", "rna"), ("mw", "rne"), ("Il", "H"), ("h", "n"), ("aa", "å"), ("ö", "o"), ("O", "Ö"), ("h", "b"), ("c", "e"), ("S", "å"), ("", "-")]
+
+
+def get_random_words(nr_of_words):
+    random.seed(0)
+    letters = "abhlmoöåthcISAOIlw-"
+    return ["".join([random.choice(letters) for i in range(random.randint(0, 10))]) for j in range(nr_of_words)]
+
+
+# The suggestions from the loop over all replacers that get_replacer_candidates had before
+def get_replacer_suggestions_with_loop(word, replacers):
+    suggestions = []
+    for replacer in replacers:
+        suggestion = word.replace(replacer[0], replacer[1])
+        if suggestion != word: # the word itself is already known to be unknown
+            suggestions.append(suggestion)
+    return suggestions
+
+
+def test_same_suggestions_as_the_loop_over_the_replacers():
+    for replacers in [test_replacers, compare_to_word_lists.default_replacers]:
+        replacer_trie = compare_to_word_lists.ReplacerTrie(replacers)
+        for word in get_random_words(5000):
+            assert [variant for variant in replacer_trie.get_variants(word) if variant != word] == get_replacer_suggestions_with_loop(word, replacers)
+
+
+def test_finds_all_matches():
+    replacer_trie = compare_to_word_lists.ReplacerTrie(test_replacers)
+    for word in get_random_words(5000):
+        matches = [(position, nr) for position in range(len(word)) for (nr, (wrong, right)) in enumerate(test_replacers) if wrong != "" and word.startswith(wrong, position)]
+        assert sorted(replacer_trie.find_matches(word)) == matches
+
+
+def test_one_position_variants():
+    replacer_trie = compare_to_word_lists.ReplacerTrie([("rn", "m"), ("a", "å")])
+    assert replacer_trie.get_variants("rnarn") == ["mam", "rnårn"]
+    assert replacer_trie.get_variants("rnarn", 1) == ["mam", "rnårn", "marn"]
+    assert replacer_trie.get_variants("rnarn", 5) == ["mam", "rnårn", "marn", "rnam"]
+    # A replacer that occurs once gives no other variant
+    assert replacer_trie.get_variants("rna", 5) == ["ma", "rnå"]
+
+
+@pytest.mark.parametrize("max_variants", [-1, 1.5, "2"])
+def test_invalid_max_replacer_variants(max_variants):
+    with pytest.raises(SystemExit):
+        compare_to_word_lists.check_max_replacer_variants(max_variants)
@@ -0,0 +1,78 @@
+import http.client
+import http.server
+import json
+import os
+import threading
+
+import pytest
+
+import compare_to_word_lists
+
+repo_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FailingCorrectionServer:
+    def correct(self, text):
+        raise ValueError("failed")
+
+
+@pytest.fixture
+def server():
+    corrector_settings = {"terminologies_file_name": os.path.join(repo_folder, "demo-word-lists.txt"), "language": "sv", "is_known_compound_function": compare_to_word_lists.is_known_compound_swedish, "tokenizer": "builtin"}
+    http_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), compare_to_word_lists.get_server_classes()[0])
+    http_server.correction_server = compare_to_word_lists.CorrectionServer(corrector_settings, None)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield http_server
+    http_server.shutdown()
+    http_server.server_close()
+
+
+def post(http_server, body, headers):
+    connection = http.client.HTTPConnection("127.0.0.1", http_server.server_port)
+    connection.putrequest("POST", "/correct")
+    for name, value in headers.items():
+        connection.putheader(name, value)
+    connection.endheaders(body)
+    response = connection.getresponse()
+    status, response_body = response.status, response.read()
+    connection.close()
+    return status, response_body
+
+
+def test_correct(server):
+    body = "Det är en text".encode("utf-8")
+    status, response_body = post(server, body, {"Content-Length": str(len(body))})
+    assert status == 200
+    assert json.loads(response_body)["text"] == "Det är en text"
+
+
+def test_text_that_is_not_utf8(server):
+    body = "Det är en text".encode("latin-1")
+    assert post(server, body, {"Content-Length": str(len(body))})[0] == 400
+
+
+def test_missing_content_length(server):
+    assert post(server, b"", {})[0] == 411
+
+
+@pytest.mark.parametrize("content_length", ["ten", "-1", ""])
+def test_invalid_content_length(server, content_length):
+    assert post(server, b"", {"Content-Length": content_length})[0] == 400
+
+
+def test_error_when_correcting(server):
+    server.correction_server = FailingCorrectionServer()
+    body = b"text"
+    assert post(server, body, {"Content-Length": str(len(body))})[0] == 500
+
+
+def test_loading_a_corrector_does_not_change_the_settings_in_use(monkeypatch):
+    monkeypatch.setattr(compare_to_word_lists, "use_builtin_tokenizer", False)
+    monkeypatch.setattr(compare_to_word_lists, "max_replacer_variants", 0)
+    corrector = compare_to_word_lists.Corrector(os.path.join(repo_folder, "demo-word-lists.txt"), "sv", is_known_compound_function=compare_to_word_lists.is_known_compound_swedish, tokenizer="builtin", max_replacer_variants=2)
+    assert not compare_to_word_lists.use_builtin_tokenizer
+    assert compare_to_word_lists.max_replacer_variants == 0
+    corrector.correct("Det är en text")
+    assert compare_to_word_lists.use_builtin_tokenizer
+    assert compare_to_word_lists.max_replacer_variants == 2
@@ -0,0 +1,51 @@
+import compare_to_word_lists
+
+
+def spaced_letters(length):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    parts = []
+    size = 0
+    nr = 0
+    while size < length:
+        # A longer word now and then, so that the line holds many separate spaced words
+        part = "word" if nr % 37 == 36 else letters[(nr * 7) % len(letters)]
+        parts.append(part)
+        size = size + len(part) + 1
+        nr = nr + 1
+    return " ".join(parts)
+
+
+# The number of spaced word candidates checked, and substrings of found spaced words indexed
+def count_find_spaced_words_work(text, monkeypatch):
+    work = [0]
+    is_spaced_word_candidate = compare_to_word_lists.is_spaced_word_candidate
+    get_spaced_word_substrings = compare_to_word_lists.get_spaced_word_substrings
+
+    def counting_is_spaced_word_candidate(new_found):
+        work[0] = work[0] + 1
+        return is_spaced_word_candidate(new_found)
+
+    def counting_get_spaced_word_substrings(found, nr_of_spaces):
+        substrings = get_spaced_word_substrings(found, nr_of_spaces)
+        work[0] = work[0] + len(substrings)
+        return substrings
+
+    with monkeypatch.context() as patch:
+        patch.setattr(compare_to_word_lists, "is_spaced_word_candidate", counting_is_spaced_word_candidate)
+        patch.setattr(compare_to_word_lists, "get_spaced_word_substrings", counting_get_spaced_word_substrings)
+        compare_to_word_lists.find_spaced_words(text)
+    return work[0]
+
+
+def test_find_spaced_words():
+    assert compare_to_word_lists.find_spaced_words("en d a g i v e n") == ["d a g i v e n"]
+    assert compare_to_word_lists.find_spaced_words("s o m trots s o m") == ["s o m"]
+    assert compare_to_word_lists.find_spaced_words("a l l t s t o r t dag s t o r t") == ["a l l t s t o r t"]
+    assert compare_to_word_lists.find_spaced_words("inga spärrade ord") == []
+
+
+def test_find_spaced_words_is_linear(monkeypatch):
+    short_work = count_find_spaced_words_work(spaced_letters(25000), monkeypatch)
+    long_work = count_find_spaced_words_work(spaced_letters(100000), monkeypatch)
+    # Four times as long a line should take about four times as much work, not sixteen
+    assert long_work < 5 * short_work
@@ -0,0 +1,59 @@
+import os
+import sqlite3
+
+import compare_to_word_lists
+from test_workers import repo_folder, run_compare_folder
+
+
+# The (old, new) pairs with their counts, from a file written by compare_folder
+def read_replacements(file_name):
+    replacements = {}
+    nr = None # the count in the heading above the pairs
+    with open(file_name) as read_from:
+        lines = read_from.read().split("\n")[3:]
+    for line in lines:
+        if line == "" or line == "-----":
+            continue
+        if "\t" in line:
+            old, new = line.split("\t")
+            replacements[(old, new)] = nr
+        else:
+            nr = int(line)
+    return replacements
+
+
+def read_table(database_file_name, query):
+    connection = sqlite3.connect(database_file_name)
+    rows = connection.execute(query).fetchall()
+    connection.close()
+    return rows
+
+
+def test_same_statistics_as_the_files(tmp_path):
+    database_file_name = str(tmp_path / "statistics.db")
+    run_compare_folder(str(tmp_path / "output"), statistics_database=database_file_name)
+    output_folder = os.path.join(str(tmp_path / "output"), "statistics", "nonsense")
+    for table, output_filename in [("replacements", "replacements_made_nonsense-statistics.txt"), ("space_replaced", "space_replaced_nonsense-statistics.txt")]:
+        rows = read_table(database_file_name, "SELECT old, new, SUM(nr) FROM " + table + " GROUP BY old, new")
+        assert dict([((old, new), nr) for (old, new, nr) in rows]) == read_replacements(os.path.join(output_folder, output_filename))
+    assert len(read_table(database_file_name, "SELECT * FROM replacements")) > 0
+    files = read_table(database_file_name, "SELECT folder, file_name, nr_of_words FROM files ORDER BY file_id")
+    corpus_folder = os.path.join(repo_folder, "nonsense-texts")
+    assert [(folder, file_name) for (folder, file_name, nr_of_words) in files] == [(folder, file_name) for folder in sorted(os.listdir(corpus_folder)) for file_name in sorted(os.listdir(os.path.join(corpus_folder, folder)))]
+    assert all([nr_of_words > 0 for (folder, file_name, nr_of_words) in files])
+
+
+def test_new_run_replaces_the_old_one(tmp_path, monkeypatch):
+    database_file_name = str(tmp_path / "statistics.db")
+    run_compare_folder(str(tmp_path / "output"), statistics_database=database_file_name)
+    tables = ["runs", "files", "not_found", "replacements", "space_replaced"]
+    rows = [read_table(database_file_name, "SELECT * FROM " + table) for table in tables]
+    # With the rows inserted one at a time, and not in batches
+    monkeypatch.setattr(compare_to_word_lists, "statistics_database_batch_size", 1)
+    run_compare_folder(str(tmp_path / "output"), statistics_database=database_file_name)
+    new_rows = [read_table(database_file_name, "SELECT * FROM " + table) for table in tables]
+    assert len(new_rows[0]) == 1
+    # The same rows, with new ids
+    assert [len(table_rows) for table_rows in new_rows] == [len(table_rows) for table_rows in rows]
+    assert sorted([row[1:] for row in new_rows[1]]) == sorted([row[1:] for row in rows[1]])
+    assert sorted([row[1:] for row in new_rows[3]]) == sorted([row[1:] for row in rows[3]])
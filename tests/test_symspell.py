@@ -0,0 +1,56 @@
+import os
+import random
+
+import pytest
+
+import compare_to_word_lists
+
+spellchecker_module = pytest.importorskip("spellchecker")
+
+repo_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_known_words():
+    return compare_to_word_lists.get_words(os.path.join(repo_folder, "example_word_lists", "some_swedish_words.txt"), [])
+
+
+# Misspellings of the words, with one or two letters deleted, inserted, replaced or swapped
+def get_misspellings(words, nr_of_misspellings, max_edits, seed):
+    random.seed(seed)
+    letters = "abcdefghijklmnopqrstuvwxyzåäö"
+    misspellings = []
+    for nr in range(nr_of_misspellings):
+        word = random.choice(words)
+        for edit_nr in range(random.randint(1, max_edits)):
+            pos = random.randrange(len(word) + 1)
+            edit = random.choice(["delete", "insert", "replace", "swap"])
+            if edit == "delete" and pos < len(word):
+                word = word[:pos] + word[pos + 1:]
+            elif edit == "insert":
+                word = word[:pos] + random.choice(letters) + word[pos:]
+            elif edit == "replace" and pos < len(word):
+                word = word[:pos] + random.choice(letters) + word[pos + 1:]
+            elif edit == "swap" and pos < len(word) - 1:
+                word = word[:pos] + word[pos + 1] + word[pos] + word[pos + 2:]
+        misspellings.append(word)
+    return misspellings
+
+
+def test_all_words_are_indexed():
+    symspell = compare_to_word_lists.SymSpellChecker(["a", "sjukhuset", "kyrka", "inf", "infinity"], 1)
+    assert symspell.words == set(["a", "sjukhuset", "kyrka", "inf", "infinity"])
+    assert symspell.candidates("sjukhusct") == set(["sjukhuset"])
+    # Numbers are not given as candidates, as in SpellChecker
+    assert symspell.candidates("infinitx") is None
+
+
+@pytest.mark.parametrize("distance, nr_of_misspellings", [(1, 1000), (2, 100)])
+def test_same_candidates_as_spellchecker(distance, nr_of_misspellings):
+    known_words = get_known_words()
+    spellchecker = compare_to_word_lists.get_spellchecker("en", distance, known_words)
+    symspell = compare_to_word_lists.get_spellchecker("en", distance, known_words, use_symspell=True)
+    assert isinstance(symspell, compare_to_word_lists.SymSpellChecker)
+    words = sorted(known_words) + sorted(spellchecker.word_frequency.dictionary.keys())[::100]
+    misspellings = get_misspellings(words, nr_of_misspellings, distance, distance) + ["Sjukhuset", "aardvark", "abandon", "anthropomorphization", "1990", "nan", "."]
+    for misspelling in misspellings:
+        assert symspell.candidates(misspelling) == spellchecker.candidates(misspelling), misspelling
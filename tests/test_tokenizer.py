@@ -0,0 +1,46 @@
+import pytest
+
+import compare_to_word_lists
+
+nltk_tokenize = pytest.importorskip("nltk.tokenize")
+
+sample_lines = [
+ "Det är \"citat\" och 'enkla citat', samt „svenska” och »franska« citattecken.",
+ "``Treebank'' citat och ‘böjda’ citattecken",
+ "Tre punkter... och en ellips … mitt i, och på slutet...",
+ "Don't, can't, I'll, we're, she'd och they've; men inte O'Brien eller rock'n'roll.",
+ "Kl. 12.30 kostade det $5.50 (ca 20 kr.), se t.ex. s. 3-4 & 5/6!",
+ "Ord med bindestreck -- och tankstreck — sista ordet.",
+ "Windows-rad\r\nmed CRLF\r\n",
+ "\ufeffBOM först på raden",
+ "",
+ "   ",
+]
+
+
+def nltk_word_tokenize(line):
+    # Without the punkt data, the built-in tokenizer treats each line as one sentence
+    return nltk_tokenize.word_tokenize(line, preserve_line=not compare_to_word_lists.is_punkt_available())
+
+
+@pytest.mark.parametrize("line", sample_lines)
+def test_builtin_tokenizer_gives_the_same_tokens_as_nltk(line):
+    compare_to_word_lists.set_tokenizer("builtin")
+    assert compare_to_word_lists.tokenize_words(line) == nltk_word_tokenize(line)
+
+
+def test_builtin_tokenizer_for_file_with_bom_and_crlf(tmp_path):
+    file_name = str(tmp_path / "text.txt")
+    with open(file_name, "w", encoding="utf-8-sig", newline="\r\n") as text_file:
+        text_file.write("\n".join(sample_lines[:6]) + "\n")
+    compare_to_word_lists.set_tokenizer("builtin")
+    for line in compare_to_word_lists.read_lines(file_name):
+        assert compare_to_word_lists.tokenize_words(line) == nltk_word_tokenize(line)
+
+
+def test_builtin_tokenizer_with_cache_cleared_for_each_chunk(monkeypatch):
+    monkeypatch.setattr(compare_to_word_lists, "max_chunk_tokens_cache_size", 1)
+    monkeypatch.setattr(compare_to_word_lists, "chunk_tokens_cache", {})
+    compare_to_word_lists.set_tokenizer("builtin")
+    for line in sample_lines:
+        assert compare_to_word_lists.tokenize_words(line) == nltk_word_tokenize(line)
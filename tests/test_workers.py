@@ -0,0 +1,94 @@
+import filecmp
+import json
+import os
+
+import compare_to_word_lists
+
+repo_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+replaces = [("b", "h"), ("à", "å"), ("the", "tbc"), ("a", "å"), ("a", "ä"), ("o", "ö"), ("m", "rn"), ("li", "h"), ("A", "Å"), ("I", "J"), ("ma", "rna"), ("mw", "rne"), ("Il", "H"), ("h", "n"), ("aa", "å"), ("ö", "o"), ("O", "Ö"), ("h", "b"), ("c", "e"), ("S", "å")]
+one_letter_words = ["m", "g", "a", "i", "å", "ä", "ö"]
+
+
+def run_compare_folder(output_folder, **kwargs):
+    if not os.path.exists(output_folder):
+        os.mkdir(output_folder)
+    compare_to_word_lists.compare_folder(corpus_folder=os.path.join(repo_folder, "nonsense-texts"),
+     terminologies_file_name=os.path.join(repo_folder, "demo-word-lists.txt"),
+     output_filename="nonsense-statistics.txt",
+     main_output=os.path.join(output_folder, "statistics"),
+     main_output_text=os.path.join(output_folder, "text"),
+     periodical="nonsense",
+     language="sv",
+     replacers=replaces,
+     one_letter_words = one_letter_words,
+     freq_dict_window=3,
+     is_known_compound_function = compare_to_word_lists.is_known_compound_swedish,
+     tokenizer="builtin",
+     plot=False,
+     **kwargs)
+
+
+# The correction cache counts depend on the number of workers
+correction_cache_statistics = "correction_cache_nonsense-statistics.txt"
+
+
+def get_differences(comparison):
+    differences = comparison.left_only + comparison.right_only + comparison.diff_files + comparison.funny_files
+    for sub_comparison in comparison.subdirs.values():
+        differences = differences + get_differences(sub_comparison)
+    return differences
+
+
+def test_same_output_for_any_number_of_workers(tmp_path):
+    run_compare_folder(str(tmp_path / "one"), workers=1)
+    run_compare_folder(str(tmp_path / "four"), workers=4)
+    comparison = filecmp.dircmp(str(tmp_path / "one"), str(tmp_path / "four"), ignore=[correction_cache_statistics])
+    assert get_differences(comparison) == []
+
+
+def test_same_output_for_any_number_of_workers_with_manifest(tmp_path):
+    run_compare_folder(str(tmp_path / "one"), workers=1, manifest_file_name=str(tmp_path / "manifest-one.json"))
+    run_compare_folder(str(tmp_path / "four"), workers=4, manifest_file_name=str(tmp_path / "manifest-four.json"))
+    # The second run with the manifest reuses the results for all files
+    run_compare_folder(str(tmp_path / "four"), workers=4, manifest_file_name=str(tmp_path / "manifest-four.json"))
+    comparison = filecmp.dircmp(str(tmp_path / "one"), str(tmp_path / "four"), ignore=[correction_cache_statistics])
+    assert get_differences(comparison) == []
+
+
+def read_correction_cache_statistics(output_folder):
+    with open(os.path.join(output_folder, "statistics", "nonsense", correction_cache_statistics)) as statistics_file:
+        lines = statistics_file.readlines()
+    # Hits, misses, files corrected and the number of files
+    return int(lines[3].split("\t")[1]), int(lines[4].split("\t")[1]), int(lines[5].split("\t")[1]), int(lines[5].split("\t")[3])
+
+
+def test_correction_cache_statistics(tmp_path):
+    manifest_file_name = str(tmp_path / "manifest.json")
+    run_compare_folder(str(tmp_path / "one"), workers=1, manifest_file_name=manifest_file_name)
+    hits, misses, nr_of_files_corrected, nr_of_files = read_correction_cache_statistics(str(tmp_path / "one"))
+    assert hits > 0 and misses > 0
+    assert nr_of_files_corrected == nr_of_files
+    # The files taken from the manifest are not counted
+    run_compare_folder(str(tmp_path / "one"), workers=1, manifest_file_name=manifest_file_name)
+    assert read_correction_cache_statistics(str(tmp_path / "one")) == (0, 0, 0, nr_of_files)
+
+
+def test_same_output_when_written_in_background(tmp_path):
+    run_compare_folder(str(tmp_path / "direct"), workers=1)
+    run_compare_folder(str(tmp_path / "background"), workers=2, write_in_background=True)
+    comparison = filecmp.dircmp(str(tmp_path / "direct"), str(tmp_path / "background"), ignore=[correction_cache_statistics])
+    assert get_differences(comparison) == []
+
+
+def test_same_output_when_profiling(tmp_path):
+    run_compare_folder(str(tmp_path / "one"), workers=1)
+    run_compare_folder(str(tmp_path / "profiled"), workers=2, profile=True)
+    profile_file_name = "profile_nonsense-statistics.json"
+    comparison = filecmp.dircmp(str(tmp_path / "one"), str(tmp_path / "profiled"), ignore=[correction_cache_statistics, profile_file_name])
+    assert get_differences(comparison) == []
+    with open(os.path.join(str(tmp_path / "profiled"), "statistics", "nonsense", profile_file_name)) as profile_file:
+        report = json.load(profile_file)
+    assert report["workers"] == 2
+    assert report["stages"]["is_known"]["calls"] > 0
+    assert report["stages"]["write output"]["calls"] > 0
+    assert sum(report["is_known_branches"].values()) > 0